@@ -10,6 +10,7 @@ bl_info = {
     "category": "Import-Export"}
 
 import bpy
+import time
 
 from bpy.types import (
         PropertyGroup,
@@ -54,6 +55,17 @@ class SCPCBAddonPrefs(bpy.types.AddonPreferences):
         description="Path to the game directory",
         subtype="DIR_PATH"
     )
+    use_room_cache: BoolProperty(
+        name="Cache Parsed Rooms",
+        description="Keep decoded rooms on disk so reimporting an unchanged RMESH skips parsing",
+        default=False
+    )
+    room_cache_size: IntProperty(
+        name="Room Cache Size (MB)",
+        description="Least recently used rooms are removed once the cache grows past this size",
+        default=512,
+        min=16
+    )
 
     def draw(self, context):
         layout = self.layout
@@ -64,6 +76,30 @@ class SCPCBAddonPrefs(bpy.types.AddonPreferences):
         row = col.row()
         row.label(text='Game Path:')
         row.prop(self, "game_path", text='')
+        row = col.row()
+        row.label(text='Cache Parsed Rooms:')
+        row.prop(self, "use_room_cache", text='')
+        row = col.row()
+        row.enabled = self.use_room_cache
+        row.label(text='Room Cache Size (MB):')
+        row.prop(self, "room_cache_size", text='')
+
+        from . import scene_rmesh
+
+        box = layout.box()
+        box.label(text="Asset Index:")
+        col = box.column(align=True)
+        asset_index = scene_rmesh.asset_index
+        if asset_index is None or asset_index.root != self.game_path or asset_index.scan_time is None:
+            col.label(text="Not built yet, it is built on the first import")
+        else:
+            stats = asset_index.get_stats()
+            col.label(text="%s files in %s directories" % (stats["files"], stats["directories"]))
+            col.label(text="Last scanned %s in %.2fs" % (time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stats["scan_time"])), stats["scan_seconds"]))
+
+        row = col.row()
+        row.enabled = bool(self.game_path)
+        row.operator(RMESH_OT_RebuildAssetIndex.bl_idname, text='Rebuild Asset Index')
 
 class RMESHObjectPropertiesGroup(PropertyGroup):
     object_type: EnumProperty(
@@ -137,6 +173,12 @@ class RMESHObjectPropertiesGroup(PropertyGroup):
         description = "???"
         )
 
+    is_proxy: BoolProperty(
+        name ="Is Proxy",
+        description = "The object shows a bounding box in place of its model geometry",
+        default = False,
+        )
+
 def render_screen(context, layout, active_property):
     box = layout.split()
     col = box.column(align=True)
@@ -183,6 +225,10 @@ def render_entity_mesh(context, layout, active_property):
     row = col.row()
     row.label(text='FX:')
     row.prop(active_property, "fx", text='')
+    if active_property.is_proxy:
+        row = col.row()
+        row.operator(RMESH_OT_LoadEntityGeometry.bl_idname, text='Load Selected').selected_only = True
+        row.operator(RMESH_OT_LoadEntityGeometry.bl_idname, text='Load All').selected_only = False
 
 class RMESH_ObjectProps(Panel):
     bl_label = "Rmesh Object Properties"
@@ -223,6 +269,11 @@ class RMESH_ObjectProps(Panel):
         elif object_type == ObjectType.entity_mesh:
             render_entity_mesh(context, layout, ob_rmesh)
 
+        if any(slot.material is not None and slot.material.get("rmesh_deferred_textures") for slot in ob.material_slots):
+            row = layout.row()
+            row.operator(RMESH_OT_LoadTextures.bl_idname, text='Load Selected Textures').selected_only = True
+            row.operator(RMESH_OT_LoadTextures.bl_idname, text='Load All Textures').selected_only = False
+
 class ExportRMESH(Operator, ExportHelper):
     """Write an RMESH file"""
     bl_idname = 'export_scene.ermesh'
@@ -264,10 +315,22 @@ class ImportRMESH(Operator, ImportHelper):
         options={'SKIP_SAVE'}
         )
 
+    use_proxies: BoolProperty(
+        name="Entity Mesh Proxies",
+        description="Import mesh entities as bounding boxes and load their model geometry later",
+        default=False,
+        )
+
+    defer_textures: BoolProperty(
+        name="Defer Textures",
+        description="Use placeholder colors for room materials and load their textures later with Load Room Textures",
+        default=False,
+        )
+
     def execute(self, context):
         from . import scene_rmesh
 
-        return scene_rmesh.import_scene(context, self.filepath, self.report)
+        return scene_rmesh.import_scene(context, self.filepath, self.report, self.use_proxies, self.defer_textures)
 
     if (4, 1, 0) <= bpy.app.version:
         def invoke(self, context, event):
@@ -276,6 +339,57 @@ class ImportRMESH(Operator, ImportHelper):
             context.window_manager.fileselect_add(self)
             return {'RUNNING_MODAL'}
 
+class RMESH_OT_RebuildAssetIndex(Operator):
+    """Scan the whole game directory again instead of revalidating the saved asset index"""
+    bl_idname = "preferences.rmesh_rebuild_asset_index"
+    bl_label = "Rebuild Asset Index"
+
+    def execute(self, context):
+        from . import scene_rmesh
+
+        asset_index = scene_rmesh.get_asset_index(rebuild=True)
+        if asset_index is None:
+            self.report({'WARNING'}, "Set the game path first")
+            return {'CANCELLED'}
+
+        stats = asset_index.get_stats()
+        self.report({'INFO'}, "Indexed %s files in %s directories in %.2fs" % (stats["files"], stats["directories"], stats["scan_seconds"]))
+        return {'FINISHED'}
+
+class RMESH_OT_LoadEntityGeometry(Operator):
+    """Replace entity mesh proxies with their full model geometry"""
+    bl_idname = "object.rmesh_load_entity_geometry"
+    bl_label = "Load Entity Mesh Geometry"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    selected_only: BoolProperty(
+        name="Selected Only",
+        description="Only load geometry for the selected proxies instead of every proxy in the scene",
+        default=True,
+        )
+
+    def execute(self, context):
+        from . import scene_rmesh
+
+        return scene_rmesh.load_entity_geometry(context, self.selected_only, self.report)
+
+class RMESH_OT_LoadTextures(Operator):
+    """Load the textures of room materials imported with deferred textures"""
+    bl_idname = "object.rmesh_load_textures"
+    bl_label = "Load Room Textures"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    selected_only: BoolProperty(
+        name="Selected Only",
+        description="Only load textures for materials on the selected objects instead of every material in the file",
+        default=True,
+        )
+
+    def execute(self, context):
+        from . import scene_rmesh
+
+        return scene_rmesh.load_textures(context, self.selected_only, self.report)
+
 if (4, 1, 0) <= bpy.app.version:
     class ImportRMESH_FileHandler(FileHandler):
         bl_idname = "RMESH_FH_import"
@@ -296,6 +410,9 @@ def menu_func_import(self, context):
 classesscp = [
     ImportRMESH,
     ExportRMESH,
+    RMESH_OT_LoadEntityGeometry,
+    RMESH_OT_LoadTextures,
+    RMESH_OT_RebuildAssetIndex,
     RMESHObjectPropertiesGroup,
     RMESH_ObjectProps
 ]
@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+class AssetIndex:
+    """Case-insensitive basename to path index of every file below a root directory.
+
+    Directory listings are kept with their mtimes so a change anywhere below the root can be detected with one
+    stat per directory, and only the changed directories are listed again."""
+    INDEX_VERSION = 1
+
+    def __init__(self, root):
+        self.root = root
+        self.directories = {}
+        self.files = {}
+        self.checked_time = 0.0
+        self.scan_time = None
+        self.scan_seconds = 0.0
+
+    def scan_tree(self, directory):
+        for root, dirs, files in os.walk(directory):
+            try:
+                mtime_ns = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+
+            self.directories[root] = (mtime_ns, files, dirs)
+
+    def remove_tree(self, directory):
+        prefix = directory + os.sep
+        for indexed_directory in [path for path in self.directories if path == directory or path.startswith(prefix)]:
+            del self.directories[indexed_directory]
+
+    def rescan_directory(self, directory):
+        """List one changed directory again, walking subdirectories new to the index and dropping removed ones"""
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as entries:
+                entries = list(entries)
+        except OSError:
+            self.remove_tree(directory)
+            return
+
+        files = []
+        dirs = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if is_dir:
+                dirs.append(entry.name)
+            else:
+                files.append(entry.name)
+
+        old_dirs = self.directories[directory][2] if directory in self.directories else []
+        self.directories[directory] = (mtime_ns, files, dirs)
+        for dir_name in set(old_dirs) - set(dirs):
+            self.remove_tree(os.path.join(directory, dir_name))
+
+        for dir_name in dirs:
+            dir_path = os.path.join(directory, dir_name)
+            # os.walk does not follow directory links either.
+            if dir_path not in self.directories and not os.path.islink(dir_path):
+                self.scan_tree(dir_path)
+
+    def scan(self):
+        start_time = time.perf_counter()
+        self.directories = {}
+        self.scan_tree(self.root)
+        self.build_files()
+        self.checked_time = time.monotonic()
+        self.scan_time = time.time()
+        self.scan_seconds = time.perf_counter() - start_time
+
+    def build_files(self):
+        """Rebuild the name index in os.walk order so the last match wins, as a full walk for each lookup did"""
+        files = {}
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            entry = self.directories.get(directory)
+            if entry is None:
+                continue
+
+            mtime_ns, file_names, dir_names = entry
+            for file_name in file_names:
+                files[file_name.lower()] = os.path.join(directory, file_name)
+
+            stack.extend(os.path.join(directory, dir_name) for dir_name in reversed(dir_names))
+
+        self.files = files
+
+    def get_stale_directories(self):
+        """Return the indexed directories that were changed or removed since they were scanned"""
+        stale_directories = []
+        for directory, entry in self.directories.items():
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                mtime_ns = None
+
+            if mtime_ns != entry[0]:
+                stale_directories.append(directory)
+
+        return stale_directories
+
+    def refresh(self, max_age=0.0):
+        """Scan the root if it has not been indexed, otherwise list the changed directories again.
+        Returns True if the index changed. Change checks are skipped for max_age seconds after the previous one"""
+        if self.directories and time.monotonic() - self.checked_time < max_age:
+            return False
+
+        if not self.directories:
+            self.scan()
+            return True
+
+        start_time = time.perf_counter()
+        stale_directories = self.get_stale_directories()
+        for directory in stale_directories:
+            # Removing an earlier stale directory may already have dropped this one.
+            if directory in self.directories:
+                self.rescan_directory(directory)
+
+        self.checked_time = time.monotonic()
+        if not stale_directories:
+            return False
+
+        self.build_files()
+        self.scan_time = time.time()
+        self.scan_seconds = time.perf_counter() - start_time
+        return True
+
+    def save(self, index_path):
+        index_data = {
+            "version": self.INDEX_VERSION,
+            "root": self.root,
+            "scan_time": self.scan_time,
+            "scan_seconds": self.scan_seconds,
+            "directories": [[directory, mtime_ns, files, dirs] for directory, (mtime_ns, files, dirs) in self.directories.items()]
+        }
+        temp_path = "%s.%s.tmp" % (index_path, os.getpid())
+        with open(temp_path, "w", encoding="utf-8") as index_stream:
+            json.dump(index_data, index_stream)
+
+        os.replace(temp_path, index_path)
+
+    def load(self, index_path):
+        """Load an index written by save for the same root. Returns False if there is no usable index file"""
+        try:
+            with open(index_path, "r", encoding="utf-8") as index_stream:
+                index_data = json.load(index_stream)
+        except (OSError, ValueError):
+            return False
+
+        if index_data.get("version") != self.INDEX_VERSION or index_data.get("root") != self.root:
+            return False
+
+        self.directories = {directory: (mtime_ns, files, dirs) for directory, mtime_ns, files, dirs in index_data["directories"]}
+        self.build_files()
+        self.checked_time = 0.0
+        self.scan_time = index_data["scan_time"]
+        self.scan_seconds = index_data["scan_seconds"]
+        return True
+
+    def get_stats(self):
+        return {
+            "root": self.root,
+            "directories": len(self.directories),
+            "files": len(self.files),
+            "scan_time": self.scan_time,
+            "scan_seconds": self.scan_seconds
+        }
+
+    def find(self, file_name):
+        """Return the path of file_name below the root or an empty string"""
+        return self.files.get(os.path.basename(file_name).lower(), "")
+
+def read_file(file_path, buffer):
+    """Read a file to the end through buffer and drop the data so the next open hits the OS cache. Returns the byte count"""
+    read_bytes = 0
+    try:
+        with open(file_path, "rb", buffering=0) as file_stream:
+            while True:
+                chunk_size = file_stream.readinto(buffer)
+                if not chunk_size:
+                    break
+
+                read_bytes += chunk_size
+    except OSError:
+        pass
+
+    return read_bytes
+
+class FilePrefetcher:
+    """Read files on background threads so loading them on the main thread later only hits the OS cache"""
+    BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self, max_workers=None):
+        if max_workers is None:
+            max_workers = min(8, os.cpu_count() or 1)
+
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="rmesh_prefetch")
+        self.futures = []
+        self.local = threading.local()
+
+    def read(self, file_path):
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is None:
+            buffer = self.local.buffer = bytearray(self.BLOCK_SIZE)
+
+        return read_file(file_path, buffer)
+
+    def start(self, file_paths):
+        """Queue reads for every distinct non-empty path, in the given order"""
+        for file_path in dict.fromkeys(file_paths):
+            if file_path:
+                self.futures.append(self.executor.submit(self.read, file_path))
+
+    def cancel(self):
+        """Drop the queued reads that have not started yet"""
+        futures, self.futures = self.futures, []
+        for future in futures:
+            future.cancel()
+
+    def shutdown(self, cancel_pending=True):
+        """Let the threads exit once the reads are done, dropping the queued ones unless cancel_pending is False"""
+        if cancel_pending:
+            self.cancel()
+
+        self.futures = []
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+"""Read/write benchmarks for process_rmesh and process_b3d on synthetic data, no Blender required.
+
+Run from the addon directory:
+    python -m benchmark --save baseline.json
+    python -m benchmark --baseline baseline.json
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+try:
+    from .process_rmesh import read_rmesh, read_rmesh_arrays, scan_rmesh, write_rmesh
+    from .process_b3d import B3DTree, B3DModelCache, GEOMETRY_CHUNKS
+    from .synthetic import DEFAULT_ENTITY_MIX, make_synthetic_rmesh, write_synthetic_b3d
+except ImportError:
+    from process_rmesh import read_rmesh, read_rmesh_arrays, scan_rmesh, write_rmesh
+    from process_b3d import B3DTree, B3DModelCache, GEOMETRY_CHUNKS
+    from synthetic import DEFAULT_ENTITY_MIX, make_synthetic_rmesh, write_synthetic_b3d
+
+ENTITY_HEAVY_MIX = {entity_type: entity_count * 100 for entity_type, entity_count in DEFAULT_ENTITY_MIX.items()}
+
+RMESH_OPERATIONS = {
+    "read_rmesh_arrays": lambda file_path, rmesh, scratch_path: read_rmesh_arrays(file_path),
+    "read_rmesh": lambda file_path, rmesh, scratch_path: read_rmesh(file_path),
+    "scan_rmesh": lambda file_path, rmesh, scratch_path: scan_rmesh(file_path),
+    "write_rmesh": lambda file_path, rmesh, scratch_path: write_rmesh(rmesh, scratch_path)
+}
+
+B3D_OPERATIONS = {
+    "parse": lambda file_path, model, scratch_path: B3DTree().parse(file_path),
+    "parse_geometry": lambda file_path, model, scratch_path: B3DTree(GEOMETRY_CHUNKS).parse(file_path)
+}
+
+# Each run parses distinct models into a fresh cache, as an import of a room with many different props would.
+# The pool gets at least two workers so it is compared even on a single core.
+PREFETCH_WORKERS = max(2, os.cpu_count() or 1)
+
+B3D_SET_OPERATIONS = {
+    "parse_serial": lambda file_paths, model, scratch_path: [B3DTree(GEOMETRY_CHUNKS).parse(file_path) for file_path in file_paths],
+    "prefetch_threads": lambda file_paths, model, scratch_path: B3DModelCache().prefetch(file_paths, GEOMETRY_CHUNKS, max_workers=PREFETCH_WORKERS)
+}
+
+SCENARIOS = [
+    {"name": "rmesh_small", "kind": "rmesh", "operations": list(RMESH_OPERATIONS),
+     "params": {"is_rmesh2": False, "mesh_count": 8, "vertex_count": 1024, "triangle_count": 1024}},
+    {"name": "rmesh_large", "kind": "rmesh", "operations": ["read_rmesh_arrays", "scan_rmesh", "write_rmesh"],
+     "params": {"is_rmesh2": False, "mesh_count": 64, "vertex_count": 8192, "triangle_count": 8192}},
+    {"name": "rmesh2_large", "kind": "rmesh", "operations": ["read_rmesh_arrays", "scan_rmesh", "write_rmesh"],
+     "params": {"is_rmesh2": True, "mesh_count": 64, "vertex_count": 8192, "triangle_count": 8192}},
+    {"name": "rmesh_entities", "kind": "rmesh", "operations": list(RMESH_OPERATIONS),
+     "params": {"is_rmesh2": False, "mesh_count": 1, "vertex_count": 64, "triangle_count": 64, "entity_mix": ENTITY_HEAVY_MIX}},
+    {"name": "rmesh2_entities", "kind": "rmesh", "operations": list(RMESH_OPERATIONS),
+     "params": {"is_rmesh2": True, "mesh_count": 1, "vertex_count": 64, "triangle_count": 64, "entity_mix": ENTITY_HEAVY_MIX}},
+    {"name": "b3d_prop", "kind": "b3d", "operations": list(B3D_OPERATIONS),
+     "params": {"node_count": 4, "vertex_count": 4096, "triangle_count": 4096}},
+    {"name": "b3d_animated", "kind": "b3d", "operations": list(B3D_OPERATIONS),
+     "params": {"node_count": 24, "vertex_count": 512, "triangle_count": 512, "key_count": 1500, "bone_count": 512}},
+    {"name": "b3d_props", "kind": "b3d_set", "operations": list(B3D_SET_OPERATIONS),
+     "params": {"model_count": 32, "node_count": 16, "vertex_count": 256, "triangle_count": 256}},
+]
+
+def measure(operation, repeat):
+    """Best wall time over repeat runs, then one extra run under tracemalloc for the peak allocation"""
+    timings = []
+    for run_idx in range(repeat):
+        gc.collect()
+        start_time = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start_time)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        operation()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return min(timings), peak_bytes
+
+def run_scenario(scenario, work_dir, repeat):
+    params = scenario["params"]
+    if scenario["kind"] == "rmesh":
+        file_path = os.path.join(work_dir, "%s.rmesh" % scenario["name"])
+        data = make_synthetic_rmesh(**params)
+        write_rmesh(data, file_path)
+        operations = RMESH_OPERATIONS
+        file_size = os.path.getsize(file_path)
+    elif scenario["kind"] == "b3d_set":
+        params = dict(params)
+        model_count = params.pop("model_count")
+        file_path = [os.path.join(work_dir, "%s_%s.b3d" % (scenario["name"], model_idx)) for model_idx in range(model_count)]
+        for model_idx, model_path in enumerate(file_path):
+            write_synthetic_b3d(model_path, seed=model_idx, **params)
+
+        data = None
+        operations = B3D_SET_OPERATIONS
+        file_size = sum(os.path.getsize(model_path) for model_path in file_path)
+    else:
+        file_path = os.path.join(work_dir, "%s.b3d" % scenario["name"])
+        data = None
+        write_synthetic_b3d(file_path, **params)
+        operations = B3D_OPERATIONS
+        file_size = os.path.getsize(file_path)
+
+    scratch_path = os.path.join(work_dir, "%s.scratch" % scenario["name"])
+    results = {}
+    for operation_name in scenario["operations"]:
+        operation = operations[operation_name]
+        seconds, peak_bytes = measure(lambda: operation(file_path, data, scratch_path), repeat)
+        results[operation_name] = {
+            "seconds": seconds,
+            "peak_bytes": peak_bytes,
+            "file_bytes": file_size,
+            "bytes_per_second": file_size / seconds if seconds > 0 else 0.0
+        }
+
+    return results
+
+def compare_results(results, baseline, threshold):
+    """Print a comparison against a baseline and return the list of regressions"""
+    regressions = []
+    for scenario_name, operations in results.items():
+        for operation_name, result in operations.items():
+            baseline_result = baseline.get(scenario_name, {}).get(operation_name)
+            if baseline_result is None:
+                continue
+
+            time_ratio = result["seconds"] / max(baseline_result["seconds"], 1e-12)
+            memory_ratio = result["peak_bytes"] / max(baseline_result["peak_bytes"], 1)
+            status = ""
+            if time_ratio > 1.0 + threshold:
+                status = "REGRESSION"
+                regressions.append((scenario_name, operation_name, time_ratio))
+
+            print("%-18s %-18s time x%.2f  peak memory x%.2f  %s" % (scenario_name, operation_name, time_ratio, memory_ratio, status))
+
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmark", description="Benchmark RMESH and B3D reading and writing on synthetic data.")
+    parser.add_argument("--scenario", action="append", default=None, help="Only run the named scenario, may be given more than once")
+    parser.add_argument("--list", action="store_true", help="List scenarios and exit")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per operation, the best run is reported")
+    parser.add_argument("--save", default=None, help="Write results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Compare results to a JSON file written with --save")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative slowdown against the baseline reported as a regression")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for scenario in SCENARIOS:
+            print("%-18s %s" % (scenario["name"], ", ".join(scenario["operations"])))
+
+        return 0
+
+    scenarios = SCENARIOS
+    if args.scenario:
+        scenarios = [scenario for scenario in SCENARIOS if scenario["name"] in args.scenario]
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="rmesh_benchmark_") as work_dir:
+        for scenario in scenarios:
+            results[scenario["name"]] = run_scenario(scenario, work_dir, max(1, args.repeat))
+            for operation_name, result in results[scenario["name"]].items():
+                print("%-18s %-18s %9.4fs  %8.1f MB/s  peak %8.1f MB" % (
+                    scenario["name"], operation_name, result["seconds"], result["bytes_per_second"] / (1024 * 1024), result["peak_bytes"] / (1024 * 1024)))
+
+    if args.save:
+        report = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results
+        }
+        with open(args.save, "w", encoding="utf-8") as report_stream:
+            json.dump(report, report_stream, indent=1)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as baseline_stream:
+            baseline = json.load(baseline_stream)["results"]
+
+        print()
+        if compare_results(results, baseline, args.threshold):
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
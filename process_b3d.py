@@ -3,47 +3,168 @@
 
 import os
 import struct
+import threading
+import numpy as np
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+INT_STRUCTS = [struct.Struct('<%di' % n) for n in range(17)]
+FLOAT_STRUCTS = [struct.Struct('<%df' % n) for n in range(17)]
+CHUNK_HEADER_STRUCT = struct.Struct('<4si')
+
+# Chunks that hold other chunks, always entered so the node hierarchy stays intact.
+CONTAINER_CHUNKS = frozenset(('BB3D', 'NODE', 'MESH'))
+# Everything the RMESH importer needs from an entity model.
+GEOMETRY_CHUNKS = frozenset(('TEXS', 'BRUS', 'VRTS', 'TRIS'))
+
+BONE_DTYPE = np.dtype([('vertex_id', '<i4'), ('weight', '<f4')])
+
+def get_key_dtype(flags):
+    fields = [('frame', '<i4')]
+    if flags & 1: fields.append(('position', '<f4', (3,)))
+    if flags & 2: fields.append(('scale', '<f4', (3,)))
+    if flags & 4: fields.append(('rotation', '<f4', (4,)))
+    return np.dtype(fields)
+
+def to_json_value(value):
+    if isinstance(value, B3DRecord):
+        return value.to_dict()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(x) for x in value]
+    return value
+
+class B3DRecord:
+    """Base of the parsed model structures. Unset fields stay None and are left out of the to_dict JSON view"""
+    __slots__ = ()
+
+    def __init__(self, *values, **fields):
+        for key in self.__slots__:
+            setattr(self, key, None)
+        for key, value in zip(self.__slots__, values):
+            setattr(self, key, value)
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+    def to_dict(self):
+        return {key: to_json_value(getattr(self, key)) for key in self.__slots__ if getattr(self, key) is not None}
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, self.to_dict())
+
+class B3DTexture(B3DRecord):
+    __slots__ = ('name', 'position', 'scale', 'rotation')
+
+class B3DBrush(B3DRecord):
+    __slots__ = ('name', 'rgba', 'shine', 'blend', 'fx', 'tids')
+
+class B3DFaces(B3DRecord):
+    """Triangles of one TRIS chunk, indices is an (N, 3) int32 array"""
+    __slots__ = ('brush_id', 'indices')
+
+class B3DNode(B3DRecord):
+    """Node with array backed geometry. keys holds one structured array per KEYS chunk"""
+    __slots__ = ('name', 'position', 'rotation', 'scale', 'brush_id', 'vertices', 'normals', 'rgba', 'uvs',
+                 'bones', 'faces', 'keys', 'parent', 'nodes')
+
+    def to_dict(self):
+        result = B3DRecord.to_dict(self)
+        if self.keys is not None:
+            result['keys'] = [dict(zip(key_array.dtype.names, to_json_value(list(key)))) for key_array in self.keys for key in key_array.tolist()]
+        return result
+
+class B3DModel(B3DRecord):
+    __slots__ = ('version', 'flags', 'frames', 'fps', 'textures', 'materials', 'nodes')
 
 class B3DParser:
-    def __init__(self):
-        self.fp = None
+    def __init__(self, chunks=None):
+        """chunks is an optional set of chunk types to decode, any other leaf chunk is skipped by its size"""
+        self.buffer = b''
+        self.pos = 0
+        self.chunks = chunks
 
     def gets(self):
-        s = b''
-        while True:
-            c = self.fp.read(1)
-            if c == b'\x00':
-                return s.decode(errors='ignore')
-            s += c
+        end = self.buffer.find(b'\x00', self.pos)
+        if end == -1:
+            end = len(self.buffer)
+        s = self.buffer[self.pos:end]
+        self.pos = end + 1
+        return s.decode(errors='ignore')
 
     def i(self,n):
-        return struct.unpack(n*'i', self.fp.read(n*4))
+        s = INT_STRUCTS[n] if n < len(INT_STRUCTS) else struct.Struct('<%di' % n)
+        values = s.unpack_from(self.buffer, self.pos)
+        self.pos += s.size
+        return values
 
     def f(self,n):
-        return struct.unpack(n*'f', self.fp.read(n*4))
+        s = FLOAT_STRUCTS[n] if n < len(FLOAT_STRUCTS) else struct.Struct('<%df' % n)
+        values = s.unpack_from(self.buffer, self.pos)
+        self.pos += s.size
+        return values
 
     def next_chunk(self):
-        pos = self.fp.tell()
-        s1,s2,s3,s4, size = struct.unpack('4ci', self.fp.read(8))
-        chunk = ''.join([chr(ord(x)) for x in (s1,s2,s3,s4)])
+        pos = self.pos
+        tag, size = CHUNK_HEADER_STRUCT.unpack_from(self.buffer, pos)
+        chunk = tag.decode('latin-1')
+        self.pos = pos + 8
         next = pos + size + 8
         return chunk, pos, size, next
 
+    def get_vertex_view(self, widths, next):
+        stride = sum(widths)
+        count = (next - self.pos) // (stride*4)
+        return np.frombuffer(self.buffer, dtype='<f4', count=count*stride, offset=self.pos).reshape(count, stride)
+
+    def read_vertices(self, flags, uv_size, next):
+        """Decode a VRTS vertex block with one array view, channels the block lacks come back empty"""
+        widths = (3, 3 if flags & 1 else 0, 4 if flags & 2 else 0, uv_size)
+        data = self.get_vertex_view(widths, next)
+
+        channels = []
+        start = 0
+        for width in widths:
+            if width:
+                channels.append(data[:, start:start + width].astype(np.float32))
+            else:
+                channels.append(np.empty((0, 3), dtype=np.float32))
+            start += width
+
+        v,n,c,u = channels
+        return {'vertices':v, 'normals':n, 'rgba':c, 'uvs':u}
+
+    def read_array(self, dtype, next):
+        """Copy the records between the cursor and next out as a structured array"""
+        count = (next - self.pos) // dtype.itemsize
+        return np.frombuffer(self.buffer, dtype=dtype, count=count, offset=self.pos).copy()
+
     def cb_result(self):
         return True
 
     def parse(self, filepath):
-        filesize = os.stat(filepath).st_size
-        self.fp = open(filepath,'rb')
+        with open(filepath,'rb') as fp:
+            return self.parse_buffer(fp.read())
+
+    def parse_buffer(self, buffer):
+        """Parse a B3D model already loaded into a bytes like object"""
+        self.buffer = buffer
+        self.pos = 0
+        filesize = len(buffer)
         stack = []
-        while self.fp.tell() <= filesize-8:
+        while self.pos <= filesize-8:
 
-            while stack and stack[-1]==self.fp.tell():
+            while stack and stack[-1]==self.pos:
                 del stack[-1]
                 self.cb_prev()
 
             chunk, pos, size, next = self.next_chunk()
 
+            if self.chunks is not None and chunk not in self.chunks and chunk not in CONTAINER_CHUNKS:
+                self.pos = next
+                continue
+
             if chunk=='BB3D':
                 self.cb_data(chunk, {'version': self.i(1)[0]})
                 continue
@@ -55,25 +176,25 @@ class B3DParser:
 
             elif chunk=='TEXS':
                 data = []
-                while self.fp.tell()<next:
+                while self.pos<next:
                     name = self.gets()
                     flags, blend = self.i(2)
                     pos = self.f(2)
                     scale = self.f(2)
                     rot = self.f(1)[0]
-                    data.append(dotdict({'name':name,'position':pos,'scale':scale,'rotation':rot}))
+                    data.append(B3DTexture(name, pos, scale, rot))
                 self.cb_data(chunk,{'textures':data})
 
             elif chunk=='BRUS':
                 n_texs = self.i(1)[0]
                 data = []
-                while self.fp.tell()<next:
+                while self.pos<next:
                     name = self.gets()
                     rgba = self.f(4)
                     shine = self.f(1)[0]
                     blend, fx = self.i(2)
                     tids = self.i(n_texs)
-                    data.append(dotdict({'name':name, 'rgba':rgba,'shine':shine, 'blend':blend,'fx':fx,'tids':tids}))
+                    data.append(B3DBrush(name, rgba, shine, blend, fx, tids))
                 self.cb_data(chunk, {'materials':data})
 
             elif chunk=='NODE':
@@ -87,12 +208,7 @@ class B3DParser:
                 continue
 
             elif chunk=='BONE':
-                bones = []
-                while self.fp.tell()<next:
-                    vertex_id = self.i(1)[0]
-                    weight = self.f(1)[0]
-                    bones.append((vertex_id, weight))
-                self.cb_data(chunk,{'bones': bones})
+                self.cb_data(chunk,{'bones': self.read_array(BONE_DTYPE, next)})
 
             elif chunk=='MESH':
                 self.cb_data(chunk, {'brush_id': self.i(1)[0]})
@@ -102,41 +218,26 @@ class B3DParser:
 
             elif chunk=='VRTS':
                 flags, tcs, tcss = self.i(3)
-                v,n,c,u = [],[],[],[]
-                while self.fp.tell()<next:
-                    v.append(self.f(3))
-                    if flags & 1: n.append(self.f(3))
-                    if flags & 2: c.append(self.f(4))
-                    if tcs*tcss: u.append(self.f(tcs*tcss))
-                self.cb_data(chunk, {'vertices':v, 'normals':n, 'rgba':c, 'uvs':u})
+                self.cb_data(chunk, self.read_vertices(flags, tcs*tcss, next))
 
             elif chunk=='TRIS':
                 brush_id = self.i(1)[0]
-                faces = []
-                while self.fp.tell()<next:
-                    vertex_id = self.i(3)
-                    faces.append(vertex_id)
+                count = (next - self.pos) // 12
+                faces = np.frombuffer(self.buffer, dtype='<i4', count=count*3, offset=self.pos).reshape(count, 3).astype(np.int32)
                 self.cb_data(chunk, {'brush_id':brush_id, 'indices':faces})
 
             elif chunk=='KEYS':
                 flags = self.i(1)[0]
-                keys = []
-                while self.fp.tell()<next:
-                    key = dotdict({'frame':self.i(1)[0]})
-                    if flags & 1: key['position'] = self.f(3)
-                    if flags & 2: key['scale'] = self.f(3)
-                    if flags & 4: key['rotation'] = self.f(4)
-                    keys.append(key)
-                self.cb_data(chunk, keys)
+                self.cb_data(chunk, self.read_array(get_key_dtype(flags), next))
 
-            self.fp.seek(next)
+            self.pos = next
 
         return self.cb_result()
 
 
 class B3DDebugParser(B3DParser):
-    def __init__(self):
-        B3DParser.__init__(self)
+    def __init__(self, chunks=None):
+        B3DParser.__init__(self, chunks)
         self.level = 0
 
     def cb_next(self):
@@ -150,23 +251,15 @@ class B3DDebugParser(B3DParser):
         print(chunk, data)
 
 
-class dotdict(dict):
-    __getattr__ = dict.get
-    __setattr__ = dict.__setitem__
-
-
 class B3DList(B3DParser):
-    def __init__(self):
-        B3DParser.__init__(self)
+    def __init__(self, chunks=None):
+        B3DParser.__init__(self, chunks)
         self.index = -1
-        self.data = dotdict()
-        self.data.nodes = []
+        self.data = B3DModel(nodes=[])
 
     def cb_next(self):
-        self.data.nodes.append(dotdict())
-        parent = self.index
+        self.data.nodes.append(B3DNode(parent=self.index, nodes=[]))
         self.index = len(self.data.nodes)-1
-        self.data.nodes[self.index].parent = parent
 
     def cb_prev(self):
         self.index = self.data.nodes[self.index].parent
@@ -176,43 +269,191 @@ class B3DList(B3DParser):
             node = self.data.nodes[self.index]
 
         if chunk in ['NODE','MESH','VRTS','BONE']:
-            node.update(data)
+            for key, value in data.items():
+                setattr(node, key, value)
         elif chunk=='TRIS':
-            if 'faces' not in node:
+            if node.faces is None:
                 node.faces = []
-            node.faces.append(dotdict(data))
+            node.faces.append(B3DFaces(data['brush_id'], data['indices']))
         elif chunk=='KEYS':
-            if 'keys' not in node:
-                node['keys'] = []
-            node['keys'].extend(data)
-        elif chunk in ['ANIM', 'TEXS', 'BRUS']:
-            self.data.update(data)
+            if node.keys is None:
+                node.keys = []
+            node.keys.append(data)
+        elif chunk in ['BB3D', 'ANIM', 'TEXS', 'BRUS']:
+            for key, value in data.items():
+                setattr(self.data, key, value)
 
     def cb_result(self):
         return self.data
 
 
 class B3DTree(B3DList):
-    def __init__(self):
-        B3DList.__init__(self)
+    def __init__(self, chunks=None):
+        B3DList.__init__(self, chunks)
 
     def cb_result(self):
         tree = []
         nodes = self.data.nodes
 
         for node in nodes:
-            node.nodes = []
-
-        for i, node in enumerate(nodes):
             if node.parent == -1:
                 tree.append(node)
             else:
                 nodes[node.parent].nodes.append(node)
-            del node['parent']
+            node.parent = None
 
-        self.data.update({'nodes':tree})
+        self.data.nodes = tree
         return self.data
 
+def get_model_nbytes(data):
+    """Rough memory footprint of a parsed model, dominated by its geometry arrays"""
+    nbytes = 0
+    stack = list(data.nodes)
+    while stack:
+        node = stack.pop()
+        nbytes += 512
+        for array in (node.vertices, node.normals, node.rgba, node.uvs, node.bones):
+            if array is not None:
+                nbytes += array.nbytes
+        for face in node.faces or []:
+            nbytes += face.indices.nbytes
+        for key_array in node.keys or []:
+            nbytes += key_array.nbytes
+        stack.extend(node.nodes)
+    return nbytes
+
+class B3DBounds(B3DParser):
+    """Bounds-only scan. Returns the (min, max) of every VRTS position in the model, or None without vertices"""
+    def __init__(self):
+        B3DParser.__init__(self, frozenset(('VRTS',)))
+        self.bounds = None
+
+    def read_vertices(self, flags, uv_size, next):
+        widths = (3, 3 if flags & 1 else 0, 4 if flags & 2 else 0, uv_size)
+        return {'vertices': self.get_vertex_view(widths, next)[:, :3]}
+
+    def cb_next(self):
+        pass
+
+    def cb_prev(self):
+        pass
+
+    def cb_data(self, chunk, data):
+        if chunk=='VRTS' and len(data['vertices']):
+            low = data['vertices'].min(axis=0)
+            high = data['vertices'].max(axis=0)
+            if self.bounds is not None:
+                low = np.minimum(low, self.bounds[0])
+                high = np.maximum(high, self.bounds[1])
+            self.bounds = (low, high)
+
+    def cb_result(self):
+        return self.bounds
+
+def parse_model(filepath, chunks=None):
+    return B3DTree(chunks).parse(filepath)
+
+class B3DModelCache:
+    """LRU cache of parsed model trees keyed by path and chunk selection, revalidated against mtime and size.
+    Cached trees are shared between callers and must be treated as read only."""
+    def __init__(self, max_bytes=256*1024*1024):
+        self.max_bytes = max_bytes
+        self.models = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get_key(self, filepath, chunks=None):
+        """Return the cache key and the file state a cached tree is valid for"""
+        filepath = os.path.abspath(filepath)
+        if chunks is not None:
+            chunks = frozenset(chunks)
+        file_stat = os.stat(filepath)
+
+        return (filepath, chunks), (file_stat.st_mtime_ns, file_stat.st_size)
+
+    def get(self, key, state):
+        with self.lock:
+            entry = self.models.get(key)
+            if entry is not None:
+                if entry[0] == state:
+                    self.models.move_to_end(key)
+                    return entry[1]
+                self.remove(key)
+
+        return None
+
+    def store(self, key, state, data):
+        nbytes = get_model_nbytes(data)
+        with self.lock:
+            if key in self.models:
+                self.remove(key)
+            self.models[key] = (state, data, nbytes)
+            self.total_bytes += nbytes
+
+            # Always keep the newest model, even when it alone is over the cap.
+            while self.total_bytes > self.max_bytes and len(self.models) > 1:
+                self.remove(next(iter(self.models)))
+
+    def parse(self, filepath, chunks=None):
+        key, state = self.get_key(filepath, chunks)
+        data = self.get(key, state)
+        if data is None:
+            data = parse_model(key[0], key[1])
+            self.store(key, state, data)
+
+        return data
+
+    def start_prefetch(self, filepaths, chunks=None, max_workers=None):
+        """Start parsing the models that are not cached yet on a thread pool and return a function that waits
+        for them and returns {filepath: tree}. Models that fail to parse are left out so the caller hits the
+        error again when it parses them itself"""
+        models = {}
+        pending = {}
+        for filepath in dict.fromkeys(filepaths):
+            try:
+                key, state = self.get_key(filepath, chunks)
+            except OSError:
+                continue
+
+            data = self.get(key, state)
+            if data is not None:
+                models[filepath] = data
+            else:
+                pending[filepath] = (key, state)
+
+        if max_workers is None:
+            max_workers = min(8, os.cpu_count() or 1)
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending))))
+        futures = {filepath: executor.submit(parse_model, key[0], key[1]) for filepath, (key, state) in pending.items()}
+        executor.shutdown(wait=False)
+
+        def collect():
+            for filepath, future in futures.items():
+                try:
+                    data = future.result()
+                except Exception:
+                    continue
+
+                key, state = pending[filepath]
+                self.store(key, state, data)
+                models[filepath] = data
+
+            return models
+
+        return collect
+
+    def prefetch(self, filepaths, chunks=None, max_workers=None):
+        """Parse the models that are not cached yet on a thread pool and return {filepath: tree}"""
+        return self.start_prefetch(filepaths, chunks, max_workers)()
+
+    def remove(self, key):
+        self.total_bytes -= self.models.pop(key)[2]
+
+    def clear(self):
+        with self.lock:
+            self.models.clear()
+            self.total_bytes = 0
+
 def dump(node, level=0):
     for node in node.nodes:
         print(node.name)
@@ -228,6 +469,6 @@ if __name__ == '__main__':
     #data = B3DList().parse(filepath) # json list
     data = B3DTree().parse(filepath) # json tree
     import json
-    print(json.dumps(data, indent=1))
+    print(json.dumps(data.to_dict(), indent=1))
     #dump(data)
 
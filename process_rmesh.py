@@ -1,8 +1,14 @@
+import io
 import os
 import json
+import mmap
 import struct
+import hashlib
+import contextlib
+import numpy as np
 
 from enum import Flag, Enum, auto
+from collections.abc import Mapping
 
 class TextureType(Enum):
     none = 0
@@ -10,6 +16,44 @@ class TextureType(Enum):
     lightmap = auto()
     transparent = auto()
 
+VERTEX_DTYPE = np.dtype([
+    ("position", "<f4", (3,)),
+    ("uv_render", "<f4", (2,)),
+    ("uv_lightmap", "<f4", (2,)),
+    ("color", "u1", (3,))
+])
+
+VERTEX2_DTYPE = np.dtype([
+    ("position", "<f4", (3,)),
+    ("uv_render", "<f4", (2,)),
+    ("uv_lightmap", "<f4", (2,)),
+    ("color", "u1", (3,)),
+    ("normal", "<f4", (3,))
+])
+
+COLLISION_VERTEX_DTYPE = np.dtype([
+    ("position", "<f4", (3,))
+])
+
+TRIANGLE_DTYPE = np.dtype([
+    ("a", "<u4"),
+    ("b", "<u4"),
+    ("c", "<u4")
+])
+
+def get_vertex_dtype(is_rmesh2):
+    if is_rmesh2:
+        return VERTEX2_DTYPE
+
+    return VERTEX_DTYPE
+
+UNSIGNED_INT_STRUCT = struct.Struct("<I")
+
+def unpack_string_from(buffer, offset):
+    string_length = UNSIGNED_INT_STRUCT.unpack_from(buffer, offset)[0]
+    offset += 4
+    return buffer[offset:offset + string_length].decode('utf-8'), offset + string_length
+
 def read_string(rmesh_stream):
     return rmesh_stream.read(read_unsigned_int(rmesh_stream)).decode('utf-8')
 
@@ -60,17 +104,360 @@ def read_color(rmesh_stream):
 def write_color(rmesh_stream, value):
     rmesh_stream.write(struct.pack('<3B', *value))
 
-def read_rmesh(file_path):
-    rmesh_dict = {
-        "rmesh_file_type": "",
-        "meshes": [],
-        "collision_meshes": [],
-        "entities": []
-    }
+class RMeshRecord(Mapping):
+    """Compact __slots__ record that can still be read and updated like the dict it replaces"""
+    __slots__ = ()
+    _keys = ()
+    _read_only_keys = ()
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._keys:
+            raise KeyError(key)
+
+        if key in self._read_only_keys:
+            raise TypeError("%s of a %s cannot be changed" % (key, type(self).__name__))
+
+        setattr(self, key, value)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, ", ".join("%s=%r" % (key, self[key]) for key in self._keys))
+
+    def to_dict(self):
+        return dict(zip(self._keys, map(self.__getattribute__, self._keys)))
+
+class RMesh(RMeshRecord):
+    __slots__ = _keys = ("rmesh_file_type", "meshes", "collision_meshes", "entities")
+
+    def __init__(self, rmesh_file_type, meshes=None, collision_meshes=None, entities=None):
+        self.rmesh_file_type = rmesh_file_type
+        self.meshes = [] if meshes is None else meshes
+        self.collision_meshes = [] if collision_meshes is None else collision_meshes
+        self.entities = [] if entities is None else entities
+
+class MeshSection(RMeshRecord):
+    __slots__ = _keys = ("textures", "vertices", "triangles")
+
+    def __init__(self, textures, vertices, triangles):
+        self.textures = textures
+        self.vertices = vertices
+        self.triangles = triangles
+
+class CollisionMesh(RMeshRecord):
+    __slots__ = _keys = ("vertices", "triangles")
+
+    def __init__(self, vertices, triangles):
+        self.vertices = vertices
+        self.triangles = triangles
+
+class EntityRecord(RMeshRecord):
+    """Base of the per layout entity records. entity_type is stored on the class and is read only, a different
+    type needs a record of that type's layout"""
+    __slots__ = ()
+    _read_only_keys = ("entity_type",)
+    entity_type = ""
+
+    def __init__(self, *field_values):
+        for field_name, field_value in zip(self.__slots__, field_values):
+            setattr(self, field_name, field_value)
+
+class EntityLayout:
+    """Field layout of one entity type. Consecutive fixed size fields are packed into one precompiled struct"""
+    def __init__(self, entity_type, fields, record_name):
+        self.entity_type = entity_type
+        self.fields = tuple(fields)
+        self.field_names = tuple(field[0] for field in fields)
+        self.record_class = type(record_name, (EntityRecord,), {
+            "__slots__": self.field_names,
+            "__module__": __name__,
+            "_keys": ("entity_type",) + self.field_names,
+            "entity_type": entity_type
+        })
+        # Each run is (struct, fields) where fields pairs every field name with the index (scalars) or slice (vectors)
+        # it takes from the unpacked values. A run without a struct is a single length prefixed string.
+        self.runs = []
+
+        run_format = ""
+        run_fields = []
+        value_idx = 0
+        for field in fields:
+            field_name, field_format = field[0], field[1]
+            if field_format == "s":
+                if run_fields:
+                    self.runs.append((struct.Struct("<%s" % run_format), tuple(run_fields)))
+                    run_format = ""
+                    run_fields = []
+                    value_idx = 0
+
+                self.runs.append((None, field_name))
+            else:
+                field_count = int(field_format[:-1] or 1)
+                if field_count == 1:
+                    field_key = value_idx
+                else:
+                    field_key = slice(value_idx, value_idx + field_count)
+
+                run_fields.append((field_name, field_key, field[2] if len(field) > 2 else None))
+                run_format += field_format
+                value_idx += field_count
+
+        if run_fields:
+            self.runs.append((struct.Struct("<%s" % run_format), tuple(run_fields)))
+
+    def read(self, rmesh_stream):
+        """Read the fields of an entity into a new record"""
+        field_values = []
+        for run_struct, run_fields in self.runs:
+            if run_struct is None:
+                field_values.append(read_string(rmesh_stream))
+                continue
+
+            values = run_struct.unpack(rmesh_stream.read(run_struct.size))
+            for field_name, field_key, field_container in run_fields:
+                if field_container is None:
+                    field_values.append(values[field_key])
+                else:
+                    field_values.append(field_container(values[field_key]))
+
+        return self.record_class(*field_values)
+
+    def unpack_from(self, buffer, offset):
+        """Decode the fields of an entity from a buffer into a new record and return it with the offset past its end"""
+        field_values = []
+        for run_struct, run_fields in self.runs:
+            if run_struct is None:
+                string_end = offset + 4 + UNSIGNED_INT_STRUCT.unpack_from(buffer, offset)[0]
+                field_values.append(buffer[offset + 4:string_end].decode('utf-8'))
+                offset = string_end
+                continue
+
+            values = run_struct.unpack_from(buffer, offset)
+            offset += run_struct.size
+            for field_name, field_key, field_container in run_fields:
+                if field_container is None:
+                    field_values.append(values[field_key])
+                else:
+                    field_values.append(field_container(values[field_key]))
+
+        return self.record_class(*field_values), offset
+
+    def write(self, rmesh_stream, entity_dict):
+        for run_struct, run_fields in self.runs:
+            if run_struct is None:
+                write_string(rmesh_stream, entity_dict[run_fields])
+                continue
+
+            values = []
+            for field_name, field_key, field_container in run_fields:
+                if type(field_key) is int:
+                    values.append(entity_dict[field_name])
+                else:
+                    values.extend(entity_dict[field_name])
+
+            rmesh_stream.write(run_struct.pack(*values))
+
+    def skip(self, rmesh_stream):
+        for run_struct, run_fields in self.runs:
+            if run_struct is None:
+                rmesh_stream.seek(read_unsigned_int(rmesh_stream), os.SEEK_CUR)
+            else:
+                rmesh_stream.seek(run_struct.size, os.SEEK_CUR)
+
+# Keyed by (entity_type, is_rmesh2). Fields are (name, struct format) with "s" for a length prefixed string,
+# multi value fields are read as tuples unless a container type is given as a third element.
+ENTITY_LAYOUTS = {}
+
+def register_entity_layout(entity_type, fields, rmesh2_fields=None):
+    """Register the field layout of an entity type, rmesh2_fields defaults to fields if RoomMesh2 did not change it"""
+    if rmesh2_fields is None:
+        rmesh2_fields = fields
+
+    record_name = "%sEntity" % "".join(part.title() for part in entity_type.split("_"))
+    for is_rmesh2, layout_fields, layout_record_name in ((False, fields, record_name), (True, rmesh2_fields, "%s2" % record_name)):
+        entity_layout = ENTITY_LAYOUTS[(entity_type, is_rmesh2)] = EntityLayout(entity_type, layout_fields, layout_record_name)
+        # Expose the record class at module level so records can be pickled.
+        globals()[layout_record_name] = entity_layout.record_class
+
+LIGHT2_FIELDS = (
+    ("position", "3f"),
+    ("range", "f"),
+    ("color", "s"),
+    ("intensity", "f"),
+    ("has_sprite", "B"),
+    ("sprite_scale", "f"),
+    ("casts_shadows", "B"),
+    ("scattering", "f"),
+    ("ff_array", "31I", list)
+)
+
+register_entity_layout("screen", (
+    ("position", "3f"),
+    ("texture_name", "s")
+))
+
+register_entity_layout("save_screen", (
+    ("position", "3f"),
+    ("model_name", "s"),
+    ("euler_rotation", "3f"),
+    ("scale", "3f"),
+    ("texture_name", "s")
+))
+
+register_entity_layout("waypoint", (
+    ("position", "3f"),
+))
+
+register_entity_layout("light", (
+    ("position", "3f"),
+    ("range", "f"),
+    ("color", "s"),
+    ("intensity", "f")
+), LIGHT2_FIELDS)
+
+register_entity_layout("light_fix", (
+    ("position", "3f"),
+    ("color", "s"),
+    ("intensity", "f"),
+    ("range", "f")
+), LIGHT2_FIELDS)
+
+register_entity_layout("spotlight", (
+    ("position", "3f"),
+    ("range", "f"),
+    ("color", "s"),
+    ("intensity", "f"),
+    ("euler_rotation", "s"),
+    ("inner_cone_angle", "I"),
+    ("outer_cone_angle", "I")
+), (
+    ("position", "3f"),
+    ("range", "f"),
+    ("color", "s"),
+    ("intensity", "f"),
+    ("has_sprite", "B"),
+    ("sprite_scale", "f"),
+    ("casts_shadows", "B"),
+    ("direction", "2f"),
+    ("inner_cosine", "f"),
+    ("scattering", "f"),
+    ("ff_array", "31I", list)
+))
+
+register_entity_layout("soundemitter", (
+    ("position", "3f"),
+    ("id", "I"),
+    ("range", "f")
+))
+
+register_entity_layout("model", (
+    ("model_name", "s"),
+), (
+    ("model_name", "s"),
+    ("position", "3f"),
+    ("euler_rotation", "3f"),
+    ("scale", "3f")
+))
+
+register_entity_layout("mesh", (
+    ("position", "3f"),
+    ("model_name", "s"),
+    ("euler_rotation", "3f"),
+    ("scale", "3f"),
+    ("has_collision", "B"),
+    ("fx", "I"),
+    ("texture_name", "s")
+))
+
+def read_textures(rmesh_stream):
+    textures = []
+    for texture_idx in range(2):
+        texture_dict = {}
+
+        texture_dict["texture_type"] = read_byte(rmesh_stream)
+        texture_dict["texture_name"] = ""
+        if TextureType(texture_dict["texture_type"]) is not TextureType.none:
+            texture_dict["texture_name"] = read_string(rmesh_stream)
+
+        textures.append(texture_dict)
+
+    return textures
+
+def read_array(rmesh_stream, dtype):
+    """Read a count prefixed block of fixed size records in one go"""
+    count = read_unsigned_int(rmesh_stream)
+    return np.frombuffer(rmesh_stream.read(count * dtype.itemsize), dtype=dtype, count=count)
+
+def read_mesh_arrays(rmesh_stream, is_rmesh2):
+    textures = read_textures(rmesh_stream)
+    vertices = read_array(rmesh_stream, get_vertex_dtype(is_rmesh2))
+    triangles = read_array(rmesh_stream, TRIANGLE_DTYPE)
+
+    return MeshSection(textures, vertices, triangles)
+
+def read_collision_mesh_arrays(rmesh_stream):
+    vertices = read_array(rmesh_stream, COLLISION_VERTEX_DTYPE)
+    triangles = read_array(rmesh_stream, TRIANGLE_DTYPE)
+
+    return CollisionMesh(vertices, triangles)
+
+def get_entity_layout(entity_type, is_rmesh2):
+    """Return the layout of an entity type. Entities carry no size, so an unknown type cannot be read past"""
+    entity_layout = ENTITY_LAYOUTS.get((entity_type, is_rmesh2))
+    if entity_layout is None:
+        raise ValueError("Unknown entity type: %s" % entity_type)
+
+    return entity_layout
+
+def read_entity(rmesh_stream, is_rmesh2):
+    return get_entity_layout(read_string(rmesh_stream), is_rmesh2).read(rmesh_stream)
+
+def unpack_entity_from(buffer, offset, is_rmesh2):
+    """Decode an entity from a buffer and return it with the offset past its end"""
+    entity_type, offset = unpack_string_from(buffer, offset)
+
+    return get_entity_layout(entity_type, is_rmesh2).unpack_from(buffer, offset)
+
+def skip_entity(rmesh_stream, is_rmesh2):
+    """Seek past an entity and return its type"""
+    entity_type = read_string(rmesh_stream)
+    get_entity_layout(entity_type, is_rmesh2).skip(rmesh_stream)
+
+    return entity_type
+
+def read_header(rmesh_stream):
+    rmesh_file_type = read_string(rmesh_stream)
+    if rmesh_file_type != "RoomMesh" and rmesh_file_type != "RoomMesh2":
+        raise ValueError('Input file was "%s" instead of "RoomMesh or RoomMesh2 and therefore is not an RMESH file' % rmesh_file_type)
+
+    return rmesh_file_type
+
+def read_rmesh_arrays(file_path, cache=None):
+    """Read an RMESH file into records with the vertex and triangle blocks of every mesh kept as structured arrays.
+    If an RMeshCache is given a cached copy is returned when the file is unchanged."""
+    if cache is not None:
+        try:
+            entry_key = cache.get_entry_path(file_path)
+        except OSError:
+            # The file itself is unreadable, let the open below report it.
+            cache = None
+        else:
+            rmesh_dict = cache.load(file_path, entry_key)
+            if rmesh_dict is not None:
+                return rmesh_dict
+
     with open(file_path, "rb") as rmesh_stream:
-        rmesh_dict["rmesh_file_type"] = read_string(rmesh_stream)
-        if rmesh_dict["rmesh_file_type"] != "RoomMesh" and rmesh_dict["rmesh_file_type"] != "RoomMesh2":
-            raise ValueError('Input file was "%s" instead of "RoomMesh or RoomMesh2 and therefore is not an RMESH file' % rmesh_dict["rmesh_file_type"])
+        rmesh_dict = RMesh(read_header(rmesh_stream))
 
         is_rmesh2 = False
         if rmesh_dict["rmesh_file_type"] == "RoomMesh2":
@@ -78,316 +465,648 @@ def read_rmesh(file_path):
 
         mesh_count = read_unsigned_int(rmesh_stream)
         for mesh_idx in range(mesh_count):
-            mesh_dict = {
-                "textures": [],
-                "vertices": [],
-                "triangles": []
-            }
+            rmesh_dict["meshes"].append(read_mesh_arrays(rmesh_stream, is_rmesh2))
+
+        collision_count = read_unsigned_int(rmesh_stream)
+        for collision_idx in range(collision_count):
+            rmesh_dict["collision_meshes"].append(read_collision_mesh_arrays(rmesh_stream))
+
+        # Entities are the last block of the file, decode them from one buffer instead of many small reads.
+        entity_count = read_unsigned_int(rmesh_stream)
+        entity_buffer = rmesh_stream.read()
+        entity_offset = 0
+        for entity_idx in range(entity_count):
+            entity_dict, entity_offset = unpack_entity_from(entity_buffer, entity_offset, is_rmesh2)
+            rmesh_dict["entities"].append(entity_dict)
 
-            for texture_idx in range(2):
-                texture_dict = {}
+    if cache is not None:
+        cache.store(file_path, rmesh_dict, entry_key)
 
-                texture_dict["texture_type"] = read_byte(rmesh_stream)
-                texture_dict["texture_name"] = ""
-                if TextureType(texture_dict["texture_type"]) is not TextureType.none:
-                    texture_dict["texture_name"] = read_string(rmesh_stream)
+    return rmesh_dict
 
-                mesh_dict["textures"].append(texture_dict)
+def iter_rmesh(file_path):
+    """Decode an RMESH file one section at a time.
 
-            vertex_count = read_unsigned_int(rmesh_stream)
-            for vertex_idx in range(vertex_count):
-                vertex_dict = {}
+    Yields ("header", rmesh_file_type) first, then ("mesh", MeshSection), ("collision_mesh", CollisionMesh)
+    and ("entity", record) pairs in file order. Nothing is kept once a section has been yielded."""
+    with open(file_path, "rb") as rmesh_stream:
+        rmesh_file_type = read_header(rmesh_stream)
+        is_rmesh2 = rmesh_file_type == "RoomMesh2"
+        yield "header", rmesh_file_type
 
-                vertex_dict["position"] = read_vector(rmesh_stream)
-                vertex_dict["uv_render"] = read_uv(rmesh_stream)
-                vertex_dict["uv_lightmap"] = read_uv(rmesh_stream)
-                vertex_dict["color"] = read_color(rmesh_stream)
-                if is_rmesh2:
-                    vertex_dict["normal"] = read_vector(rmesh_stream)
-                    print(vertex_dict["position"])
-                    print(vertex_dict["normal"])
-                    print()
+        mesh_count = read_unsigned_int(rmesh_stream)
+        for mesh_idx in range(mesh_count):
+            yield "mesh", read_mesh_arrays(rmesh_stream, is_rmesh2)
 
-                mesh_dict["vertices"].append(vertex_dict)
+        collision_count = read_unsigned_int(rmesh_stream)
+        for collision_idx in range(collision_count):
+            yield "collision_mesh", read_collision_mesh_arrays(rmesh_stream)
 
-            triangle_count = read_unsigned_int(rmesh_stream)
-            for triangle_idx in range(triangle_count):
-                triangle_dict = {}
+        entity_count = read_unsigned_int(rmesh_stream)
+        for entity_idx in range(entity_count):
+            yield "entity", read_entity(rmesh_stream, is_rmesh2)
 
-                triangle_dict["a"] = read_unsigned_int(rmesh_stream)
-                triangle_dict["b"] = read_unsigned_int(rmesh_stream)
-                triangle_dict["c"] = read_unsigned_int(rmesh_stream)
+def skip_array(rmesh_stream, dtype):
+    """Seek past a count prefixed block of fixed size records and return the record count"""
+    count = read_unsigned_int(rmesh_stream)
+    rmesh_stream.seek(count * dtype.itemsize, os.SEEK_CUR)
 
-                mesh_dict["triangles"].append(triangle_dict)
+    return count
 
-            rmesh_dict["meshes"].append(mesh_dict)
+def scan_rmesh(file_path):
+    """Summarize an RMESH file without decoding any geometry"""
+    summary = {
+        "file_path": file_path,
+        "file_size": os.path.getsize(file_path),
+        "rmesh_file_type": "",
+        "mesh_count": 0,
+        "collision_mesh_count": 0,
+        "entity_count": 0,
+        "vertex_count": 0,
+        "triangle_count": 0,
+        "collision_vertex_count": 0,
+        "collision_triangle_count": 0,
+        "texture_names": [],
+        "entity_types": {}
+    }
+    with open(file_path, "rb") as rmesh_stream:
+        summary["rmesh_file_type"] = read_header(rmesh_stream)
+        is_rmesh2 = summary["rmesh_file_type"] == "RoomMesh2"
+        vertex_dtype = get_vertex_dtype(is_rmesh2)
+
+        summary["mesh_count"] = read_unsigned_int(rmesh_stream)
+        for mesh_idx in range(summary["mesh_count"]):
+            for texture_dict in read_textures(rmesh_stream):
+                texture_name = texture_dict["texture_name"]
+                if texture_name and texture_name not in summary["texture_names"]:
+                    summary["texture_names"].append(texture_name)
+
+            summary["vertex_count"] += skip_array(rmesh_stream, vertex_dtype)
+            summary["triangle_count"] += skip_array(rmesh_stream, TRIANGLE_DTYPE)
+
+        summary["collision_mesh_count"] = read_unsigned_int(rmesh_stream)
+        for collision_idx in range(summary["collision_mesh_count"]):
+            summary["collision_vertex_count"] += skip_array(rmesh_stream, COLLISION_VERTEX_DTYPE)
+            summary["collision_triangle_count"] += skip_array(rmesh_stream, TRIANGLE_DTYPE)
+
+        summary["entity_count"] = read_unsigned_int(rmesh_stream)
+        entity_types = summary["entity_types"]
+        for entity_idx in range(summary["entity_count"]):
+            entity_type = skip_entity(rmesh_stream, is_rmesh2)
+            entity_types[entity_type] = entity_types.get(entity_type, 0) + 1
+
+    return summary
+
+def scan_rmesh_directory(directory_path):
+    """Summarize every RMESH file found under a directory"""
+    summaries = []
+    for root, dirs, files in os.walk(directory_path):
+        for file in sorted(files):
+            if file.lower().endswith(".rmesh"):
+                summaries.append(scan_rmesh(os.path.join(root, file)))
+
+    return summaries
+
+class RMeshFile:
+    """Memory mapped RMESH file that indexes section offsets up front and decodes sections on access"""
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.mesh_offsets = []
+        self.collision_mesh_offsets = []
+        self.entity_offsets = []
+        self.entity_types = []
+
+        self._file = open(file_path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.rmesh_file_type = read_header(self._map)
+            self.is_rmesh2 = self.rmesh_file_type == "RoomMesh2"
+            self._build_index()
+        except:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._file is None:
+            return
+
+        if getattr(self, "_map", None) is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Arrays handed out by get_mesh still point into the map, it is released with them.
+                pass
+
+            self._map = None
+
+        self._file.close()
+        self._file = None
+
+    def _map_array(self, dtype):
+        count = read_unsigned_int(self._map)
+        offset = self._map.tell()
+        self._map.seek(count * dtype.itemsize, os.SEEK_CUR)
+        return np.frombuffer(self._map, dtype=dtype, count=count, offset=offset)
+
+    def _build_index(self):
+        vertex_dtype = get_vertex_dtype(self.is_rmesh2)
+
+        mesh_count = read_unsigned_int(self._map)
+        for mesh_idx in range(mesh_count):
+            self.mesh_offsets.append(self._map.tell())
+            read_textures(self._map)
+            skip_array(self._map, vertex_dtype)
+            skip_array(self._map, TRIANGLE_DTYPE)
 
-        collision_count = read_unsigned_int(rmesh_stream)
+        collision_count = read_unsigned_int(self._map)
         for collision_idx in range(collision_count):
-            mesh_dict = {
-                "vertices": [],
-                "triangles": []
-            }
+            self.collision_mesh_offsets.append(self._map.tell())
+            skip_array(self._map, COLLISION_VERTEX_DTYPE)
+            skip_array(self._map, TRIANGLE_DTYPE)
 
-            vertex_count = read_unsigned_int(rmesh_stream)
-            for vertex_idx in range(vertex_count):
-                vertex_dict = {}
+        entity_count = read_unsigned_int(self._map)
+        for entity_idx in range(entity_count):
+            self.entity_offsets.append(self._map.tell())
+            self.entity_types.append(skip_entity(self._map, self.is_rmesh2))
 
-                vertex_dict["position"] = read_vector(rmesh_stream)
+    @property
+    def mesh_count(self):
+        return len(self.mesh_offsets)
 
-                mesh_dict["vertices"].append(vertex_dict)
+    @property
+    def collision_mesh_count(self):
+        return len(self.collision_mesh_offsets)
 
-            triangle_count = read_unsigned_int(rmesh_stream)
-            for triangle_idx in range(triangle_count):
-                triangle_dict = {}
+    @property
+    def entity_count(self):
+        return len(self.entity_offsets)
 
-                triangle_dict["a"] = read_unsigned_int(rmesh_stream)
-                triangle_dict["b"] = read_unsigned_int(rmesh_stream)
-                triangle_dict["c"] = read_unsigned_int(rmesh_stream)
+    def get_mesh(self, mesh_idx):
+        """Decode one mesh section, vertices and triangles are read only views into the file"""
+        self._map.seek(self.mesh_offsets[mesh_idx])
+        textures = read_textures(self._map)
+        vertices = self._map_array(get_vertex_dtype(self.is_rmesh2))
+        triangles = self._map_array(TRIANGLE_DTYPE)
 
-                mesh_dict["triangles"].append(triangle_dict)
+        return MeshSection(textures, vertices, triangles)
 
-            rmesh_dict["collision_meshes"].append(mesh_dict)
+    def get_collision_mesh(self, collision_idx):
+        self._map.seek(self.collision_mesh_offsets[collision_idx])
+        vertices = self._map_array(COLLISION_VERTEX_DTYPE)
+        triangles = self._map_array(TRIANGLE_DTYPE)
 
-        entity_count = read_unsigned_int(rmesh_stream)
-        for entity_idx in range(entity_count):
-            entity_dict = {}
-            entity_dict["entity_type"] = read_string(rmesh_stream)
-            if entity_dict["entity_type"] == "screen":
-                entity_dict["position"] = read_vector(rmesh_stream)
-                entity_dict["texture_name"] = read_string(rmesh_stream)
-
-            elif entity_dict["entity_type"] == "save_screen":
-                entity_dict["position"] = read_vector(rmesh_stream)
-                entity_dict["model_name"] = read_string(rmesh_stream)
-                entity_dict["euler_rotation"] = read_vector(rmesh_stream)
-                entity_dict["scale"] = read_vector(rmesh_stream)
-                entity_dict["texture_name"] = read_string(rmesh_stream)
-
-            elif entity_dict["entity_type"] == "waypoint":
-                entity_dict["position"] = read_vector(rmesh_stream)
-
-            elif entity_dict["entity_type"] == "light":
-                if is_rmesh2:
-                    entity_dict["position"] = read_vector(rmesh_stream)
-                    entity_dict["range"] = read_float(rmesh_stream)
-                    entity_dict["color"] = read_string(rmesh_stream)
-                    entity_dict["intensity"] = read_float(rmesh_stream)
-                    entity_dict["has_sprite"] = read_byte(rmesh_stream)
-                    entity_dict["sprite_scale"] = read_float(rmesh_stream)
-                    entity_dict["casts_shadows"] = read_byte(rmesh_stream)
-                    entity_dict["scattering"] = read_float(rmesh_stream)
-                    entity_dict["ff_array"] = []
-                    for ff in range(31):
-                        ff_element = read_unsigned_int(rmesh_stream)
-                        entity_dict["ff_array"].append(ff_element)
-                else:
-                    entity_dict["position"] = read_vector(rmesh_stream)
-                    entity_dict["range"] = read_float(rmesh_stream)
-                    entity_dict["color"] = read_string(rmesh_stream)
-                    entity_dict["intensity"] = read_float(rmesh_stream)
-
-            elif entity_dict["entity_type"] == "light_fix":
-                if is_rmesh2:
-                    entity_dict["position"] = read_vector(rmesh_stream)
-                    entity_dict["range"] = read_float(rmesh_stream)
-                    entity_dict["color"] = read_string(rmesh_stream)
-                    entity_dict["intensity"] = read_float(rmesh_stream)
-                    entity_dict["has_sprite"] = read_byte(rmesh_stream)
-                    entity_dict["sprite_scale"] = read_float(rmesh_stream)
-                    entity_dict["casts_shadows"] = read_byte(rmesh_stream)
-                    entity_dict["scattering"] = read_float(rmesh_stream)
-                    entity_dict["ff_array"] = []
-                    for ff in range(31):
-                        ff_element = read_unsigned_int(rmesh_stream)
-                        entity_dict["ff_array"].append(ff_element)
-                else:
-                    entity_dict["position"] = read_vector(rmesh_stream)
-                    entity_dict["color"] = read_string(rmesh_stream)
-                    entity_dict["intensity"] = read_float(rmesh_stream)
-                    entity_dict["range"] = read_float(rmesh_stream)
-
-            elif entity_dict["entity_type"] == "spotlight":
-                entity_dict["position"] = read_vector(rmesh_stream)
-                entity_dict["range"] = read_float(rmesh_stream)
-                entity_dict["color"] = read_string(rmesh_stream)
-                entity_dict["intensity"] = read_float(rmesh_stream)
-                if is_rmesh2:
-                    entity_dict["has_sprite"] = read_byte(rmesh_stream)
-                    entity_dict["sprite_scale"] = read_float(rmesh_stream)
-                    entity_dict["casts_shadows"] = read_byte(rmesh_stream)
-                    entity_dict["direction"] = read_2d_vector(rmesh_stream)
-                    entity_dict["inner_cosine"] = read_float(rmesh_stream)
-                    entity_dict["scattering"] = read_float(rmesh_stream)
-                    entity_dict["ff_array"] = []
-                    for ff in range(31):
-                        ff_element = read_unsigned_int(rmesh_stream)
-                        entity_dict["ff_array"].append(ff_element)
-                else:
-                    entity_dict["euler_rotation"] = read_string(rmesh_stream)
-                    entity_dict["inner_cone_angle"] = read_unsigned_int(rmesh_stream)
-                    entity_dict["outer_cone_angle"] = read_unsigned_int(rmesh_stream)
-
-            elif entity_dict["entity_type"] == "soundemitter":
-                entity_dict["position"] = read_vector(rmesh_stream)
-                entity_dict["id"] = read_unsigned_int(rmesh_stream)
-                entity_dict["range"] = read_float(rmesh_stream)
-
-            elif entity_dict["entity_type"] == "model":
-                entity_dict["model_name"] = read_string(rmesh_stream)
-                if is_rmesh2:
-                    vertex_dict["position"] = read_vector(rmesh_stream)
-                    entity_dict["euler_rotation"] = read_vector(rmesh_stream)
-                    entity_dict["scale"] = read_vector(rmesh_stream)
-
-            elif entity_dict["entity_type"] == "mesh":
-                entity_dict["position"] = read_vector(rmesh_stream)
-                entity_dict["model_name"] = read_string(rmesh_stream)
-                entity_dict["euler_rotation"] = read_vector(rmesh_stream)
-                entity_dict["scale"] = read_vector(rmesh_stream)
-                entity_dict["has_collision"] = read_byte(rmesh_stream)
-                entity_dict["fx"] = read_unsigned_int(rmesh_stream)
-                entity_dict["texture_name"] = read_string(rmesh_stream)
-            else:
-                print("Unknown entity type: %s" % entity_dict["entity_type"])
+        return CollisionMesh(vertices, triangles)
 
-            rmesh_dict["entities"].append(entity_dict)
+    def get_entity(self, entity_idx):
+        self._map.seek(self.entity_offsets[entity_idx])
+        return read_entity(self._map, self.is_rmesh2)
+
+    def get_entities(self, entity_type=None):
+        """Decode every entity, or only the entities of the given type"""
+        entities = []
+        for entity_idx, current_type in enumerate(self.entity_types):
+            if entity_type is None or current_type == entity_type:
+                entities.append(self.get_entity(entity_idx))
+
+        return entities
+
+    def to_arrays(self):
+        """Decode the whole file into the same layout read_rmesh_arrays returns"""
+        meshes = [self.get_mesh(mesh_idx) for mesh_idx in range(self.mesh_count)]
+        collision_meshes = [self.get_collision_mesh(collision_idx) for collision_idx in range(self.collision_mesh_count)]
+
+        return RMesh(self.rmesh_file_type, meshes, collision_meshes, self.get_entities())
+
+def vertices_to_dicts(vertices):
+    """Convert a structured vertex array to the list of dicts form"""
+    field_names = vertices.dtype.names
+    columns = [map(tuple, vertices[field_name].tolist()) for field_name in field_names]
+
+    return [dict(zip(field_names, values)) for values in zip(*columns)]
+
+def triangles_to_dicts(triangles):
+    """Convert a structured triangle array to the list of dicts form"""
+    return [{"a": a, "b": b, "c": c} for a, b, c in triangles.tolist()]
+
+def entity_to_dict(entity_dict):
+    if isinstance(entity_dict, RMeshRecord):
+        return entity_dict.to_dict()
+
+    return dict(entity_dict)
+
+def rmesh_arrays_to_dict(rmesh_arrays):
+    """Convert the output of read_rmesh_arrays to the dict form returned by read_rmesh"""
+    rmesh_dict = {
+        "rmesh_file_type": rmesh_arrays["rmesh_file_type"],
+        "meshes": [],
+        "collision_meshes": [],
+        "entities": [entity_to_dict(entity_dict) for entity_dict in rmesh_arrays["entities"]]
+    }
+    for mesh_arrays in rmesh_arrays["meshes"]:
+        mesh_dict = {
+            "textures": mesh_arrays["textures"],
+            "vertices": vertices_to_dicts(mesh_arrays["vertices"]),
+            "triangles": triangles_to_dicts(mesh_arrays["triangles"])
+        }
+        rmesh_dict["meshes"].append(mesh_dict)
+
+    for collision_arrays in rmesh_arrays["collision_meshes"]:
+        mesh_dict = {
+            "vertices": vertices_to_dicts(collision_arrays["vertices"]),
+            "triangles": triangles_to_dicts(collision_arrays["triangles"])
+        }
+        rmesh_dict["collision_meshes"].append(mesh_dict)
 
     return rmesh_dict
 
-def write_rmesh(rmesh_dict, output_path):
-    with open(output_path, "wb") as rmesh_stream:
-        if rmesh_dict["rmesh_file_type"] != "RoomMesh" and rmesh_dict["rmesh_file_type"] != "RoomMesh2":
+def read_rmesh(file_path):
+    return rmesh_arrays_to_dict(read_rmesh_arrays(file_path))
+
+def make_vertex_array(position, uv_render, uv_lightmap, color, normal=None):
+    """Build a structured vertex array from contiguous per component buffers"""
+    vertex_dtype = get_vertex_dtype(normal is not None)
+    vertex_array = np.empty(len(position), dtype=vertex_dtype)
+    vertex_array["position"] = position
+    vertex_array["uv_render"] = uv_render
+    vertex_array["uv_lightmap"] = uv_lightmap
+    vertex_array["color"] = color
+    if normal is not None:
+        vertex_array["normal"] = normal
+
+    return vertex_array
+
+def vertices_to_array(vertices, dtype):
+    """Convert vertex dicts or a structured vertex array to an array with the given layout"""
+    if isinstance(vertices, np.ndarray) and vertices.dtype == dtype:
+        return vertices
+
+    vertex_array = np.empty(len(vertices), dtype=dtype)
+    if isinstance(vertices, np.ndarray):
+        for field_name in dtype.names:
+            vertex_array[field_name] = vertices[field_name]
+    elif len(vertices) > 0:
+        for field_name in dtype.names:
+            vertex_array[field_name] = [vertex_dict[field_name] for vertex_dict in vertices]
+
+    return vertex_array
+
+def triangles_to_array(triangles):
+    """Convert triangle dicts, a structured triangle array or an (N, 3) index array to a structured triangle array"""
+    if isinstance(triangles, np.ndarray):
+        if triangles.dtype == TRIANGLE_DTYPE:
+            return triangles
+
+        index_array = np.ascontiguousarray(triangles, dtype="<u4").reshape(-1, 3)
+        return index_array.view(TRIANGLE_DTYPE).reshape(-1)
+
+    triangle_array = np.empty(len(triangles), dtype=TRIANGLE_DTYPE)
+    for field_name in TRIANGLE_DTYPE.names:
+        triangle_array[field_name] = [triangle_dict[field_name] for triangle_dict in triangles]
+
+    return triangle_array
+
+def write_array(rmesh_stream, array):
+    """Write a count prefixed block of fixed size records with a single buffer write"""
+    write_unsigned_int(rmesh_stream, len(array))
+    rmesh_stream.write(array.tobytes())
+
+def write_textures(rmesh_stream, textures):
+    for texture_dict in textures:
+        write_byte(rmesh_stream, texture_dict["texture_type"])
+        if TextureType(texture_dict["texture_type"]) is not TextureType.none:
+            write_string(rmesh_stream, texture_dict["texture_name"])
+
+def write_mesh_arrays(rmesh_stream, mesh_dict, is_rmesh2):
+    write_textures(rmesh_stream, mesh_dict["textures"])
+    write_array(rmesh_stream, vertices_to_array(mesh_dict["vertices"], get_vertex_dtype(is_rmesh2)))
+    write_array(rmesh_stream, triangles_to_array(mesh_dict["triangles"]))
+
+def write_collision_mesh_arrays(rmesh_stream, collision_dict):
+    write_array(rmesh_stream, vertices_to_array(collision_dict["vertices"], COLLISION_VERTEX_DTYPE))
+    write_array(rmesh_stream, triangles_to_array(collision_dict["triangles"]))
+
+def write_entity(rmesh_stream, entity_dict, is_rmesh2):
+    entity_layout = get_entity_layout(entity_dict["entity_type"], is_rmesh2)
+    write_string(rmesh_stream, entity_dict["entity_type"])
+    entity_layout.write(rmesh_stream, entity_dict)
+
+class RMeshWriter:
+    """Incremental RMESH writer. Sections are written as they are added and the count in front of each block is
+    patched once the block is finished, so meshes, collision meshes and entities must be added in that order."""
+    SECTION_TYPES = ("mesh", "collision_mesh", "entity")
+
+    def __init__(self, output_path, rmesh_file_type):
+        if rmesh_file_type != "RoomMesh" and rmesh_file_type != "RoomMesh2":
             raise ValueError("Input is not an RMESH file")
 
-        is_rmesh2 = False
-        if rmesh_dict["rmesh_file_type"] == "RoomMesh2":
-            is_rmesh2 = True
+        self.rmesh_file_type = rmesh_file_type
+        self.is_rmesh2 = rmesh_file_type == "RoomMesh2"
+        self.output_path = output_path
+        self.rmesh_stream = open(output_path, "wb")
+        write_string(self.rmesh_stream, rmesh_file_type)
+        self.section_idx = -1
+        self.count_offset = None
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def begin_section(self, section_type):
+        """Finish every block before section_type and start its block if it is not the current one"""
+        section_idx = self.SECTION_TYPES.index(section_type)
+        if section_idx < self.section_idx:
+            raise ValueError("Cannot add a %s after the %s block has been started" % (section_type, self.SECTION_TYPES[self.section_idx]))
+
+        while self.section_idx < section_idx:
+            self.end_section()
+            self.section_idx += 1
+            self.count_offset = self.rmesh_stream.tell()
+            self.count = 0
+            write_unsigned_int(self.rmesh_stream, 0)
+
+    def end_section(self):
+        if self.count_offset is None:
+            return
+
+        if self.count:
+            end_offset = self.rmesh_stream.tell()
+            self.rmesh_stream.seek(self.count_offset)
+            write_unsigned_int(self.rmesh_stream, self.count)
+            self.rmesh_stream.seek(end_offset)
+
+        self.count_offset = None
+
+    def add_mesh(self, mesh_dict):
+        self.begin_section("mesh")
+        write_mesh_arrays(self.rmesh_stream, mesh_dict, self.is_rmesh2)
+        self.count += 1
+
+    def add_collision_mesh(self, collision_dict):
+        self.begin_section("collision_mesh")
+        write_collision_mesh_arrays(self.rmesh_stream, collision_dict)
+        self.count += 1
+
+    def add_entity(self, entity_dict):
+        self.begin_section("entity")
+        write_entity(self.rmesh_stream, entity_dict, self.is_rmesh2)
+        self.count += 1
+
+    def add(self, section_type, section):
+        """Add a (section_type, section) pair as yielded by iter_rmesh"""
+        if section_type == "header":
+            if section != self.rmesh_file_type:
+                raise ValueError("Cannot write a %s section into a %s file" % (section, self.rmesh_file_type))
+        elif section_type == "mesh":
+            self.add_mesh(section)
+        elif section_type == "collision_mesh":
+            self.add_collision_mesh(section)
+        elif section_type == "entity":
+            self.add_entity(section)
+        else:
+            raise ValueError("Unknown section type: %s" % section_type)
+
+    def close(self):
+        if self.rmesh_stream.closed:
+            return
+
+        # Blocks that never received a section still need their zero count.
+        self.begin_section("entity")
+        self.end_section()
+        self.rmesh_stream.close()
+
+    def abort(self):
+        """Close without patching the block counts and delete the partial output"""
+        if self.rmesh_stream.closed:
+            return
+
+        self.rmesh_stream.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.output_path)
 
-        write_string(rmesh_stream, rmesh_dict["rmesh_file_type"])
-        write_unsigned_int(rmesh_stream, len(rmesh_dict["meshes"]))
+def write_rmesh(rmesh_dict, output_path):
+    """Write an RMESH file. Mesh sections may hold vertex and triangle dicts or structured arrays"""
+    with RMeshWriter(output_path, rmesh_dict["rmesh_file_type"]) as rmesh_writer:
         for mesh_dict in rmesh_dict["meshes"]:
-            for texture_dict in mesh_dict["textures"]:
-                write_byte(rmesh_stream, texture_dict["texture_type"])
-                if TextureType(texture_dict["texture_type"]) is not TextureType.none:
-                    write_string(rmesh_stream, texture_dict["texture_name"])
-
-            write_unsigned_int(rmesh_stream, len(mesh_dict["vertices"]))
-            for vertex_dict in mesh_dict["vertices"]:
-                write_vector(rmesh_stream, vertex_dict["position"])
-                write_uv(rmesh_stream, vertex_dict["uv_render"])
-                write_uv(rmesh_stream, vertex_dict["uv_lightmap"])
-                write_color(rmesh_stream, vertex_dict["color"])
-                if is_rmesh2:
-                    write_vector(rmesh_stream, vertex_dict["normal"])
-
-            write_unsigned_int(rmesh_stream, len(mesh_dict["triangles"]))
-            for triangle_dict in mesh_dict["triangles"]:
-                write_unsigned_int(rmesh_stream, triangle_dict["a"])
-                write_unsigned_int(rmesh_stream, triangle_dict["b"])
-                write_unsigned_int(rmesh_stream, triangle_dict["c"])
-
-        write_unsigned_int(rmesh_stream, len(rmesh_dict["collision_meshes"]))
-        for collision_dict in rmesh_dict["collision_meshes"]:
-            write_unsigned_int(rmesh_stream, len(collision_dict["vertices"]))
-            for vertex_dict in collision_dict["vertices"]:
-                write_vector(rmesh_stream, vertex_dict["position"])
+            rmesh_writer.add_mesh(mesh_dict)
 
-            write_unsigned_int(rmesh_stream, len(collision_dict["triangles"]))
-            for triangle_dict in collision_dict["triangles"]:
-                write_unsigned_int(rmesh_stream, triangle_dict["a"])
-                write_unsigned_int(rmesh_stream, triangle_dict["b"])
-                write_unsigned_int(rmesh_stream, triangle_dict["c"])
+        for collision_dict in rmesh_dict["collision_meshes"]:
+            rmesh_writer.add_collision_mesh(collision_dict)
 
-        write_unsigned_int(rmesh_stream, len(rmesh_dict["entities"]))
         for entity_dict in rmesh_dict["entities"]:
-            write_string(rmesh_stream, entity_dict["entity_type"])
-            if entity_dict["entity_type"] == "screen":
-                write_vector(rmesh_stream, entity_dict["position"])
-                write_string(rmesh_stream, entity_dict["texture_name"])
-
-            elif entity_dict["entity_type"] == "save_screen":
-                write_vector(rmesh_stream, entity_dict["position"])
-                write_string(rmesh_stream, entity_dict["model_name"])
-                write_vector(rmesh_stream, entity_dict["euler_rotation"])
-                write_vector(rmesh_stream, entity_dict["scale"])
-                write_string(rmesh_stream, entity_dict["texture_name"])
-
-            elif entity_dict["entity_type"] == "waypoint":
-                write_vector(rmesh_stream, entity_dict["position"])
-
-            elif entity_dict["entity_type"] == "light":
-                if is_rmesh2:
-                    write_vector(rmesh_stream, entity_dict["position"])
-                    write_float(rmesh_stream, entity_dict["range"])
-                    write_string(rmesh_stream, entity_dict["color"])
-                    write_float(rmesh_stream, entity_dict["intensity"])
-                    write_byte(rmesh_stream, entity_dict["has_sprite"])
-                    write_float(rmesh_stream, entity_dict["sprite_scale"])
-                    write_byte(rmesh_stream, entity_dict["casts_shadows"])
-                    write_float(rmesh_stream, entity_dict["scattering"])
-                    for ff_element in entity_dict["ff_array"]:
-                        write_unsigned_int(rmesh_stream, ff_element)
-                else:
-                    write_vector(rmesh_stream, entity_dict["position"])
-                    write_float(rmesh_stream, entity_dict["range"])
-                    write_string(rmesh_stream, entity_dict["color"])
-                    write_float(rmesh_stream, entity_dict["intensity"])
-
-            elif entity_dict["entity_type"] == "light_fix":
-                if is_rmesh2:
-                    write_vector(rmesh_stream, entity_dict["position"])
-                    write_float(rmesh_stream, entity_dict["range"])
-                    write_string(rmesh_stream, entity_dict["color"])
-                    write_float(rmesh_stream, entity_dict["intensity"])
-                    write_byte(rmesh_stream, entity_dict["has_sprite"])
-                    write_float(rmesh_stream, entity_dict["sprite_scale"])
-                    write_byte(rmesh_stream, entity_dict["casts_shadows"])
-                    write_float(rmesh_stream, entity_dict["scattering"])
-                    for ff_element in entity_dict["ff_array"]:
-                        write_unsigned_int(rmesh_stream, ff_element)
-                else:
-                    write_vector(rmesh_stream, entity_dict["position"])
-                    write_string(rmesh_stream, entity_dict["color"])
-                    write_float(rmesh_stream, entity_dict["intensity"])
-                    write_float(rmesh_stream, entity_dict["range"])
-
-            elif entity_dict["entity_type"] == "spotlight":
-                write_vector(rmesh_stream, entity_dict["position"])
-                write_float(rmesh_stream, entity_dict["range"])
-                write_string(rmesh_stream, entity_dict["color"])
-                write_float(rmesh_stream, entity_dict["intensity"])
-                if is_rmesh2:
-                    write_byte(rmesh_stream, entity_dict["has_sprite"])
-                    write_float(rmesh_stream, entity_dict["sprite_scale"])
-                    write_byte(rmesh_stream, entity_dict["casts_shadows"])
-                    write_2d_vector(rmesh_stream, entity_dict["direction"])
-                    write_float(rmesh_stream, entity_dict["inner_cosine"])
-                    write_float(rmesh_stream, entity_dict["scattering"])
-                    for ff_element in entity_dict["ff_array"]:
-                        write_unsigned_int(rmesh_stream, ff_element)
+            rmesh_writer.add_entity(entity_dict)
+
+class RMeshCache:
+    """On disk cache of decoded rooms with LRU eviction once the cache grows past max_bytes.
+
+    Entries are keyed by the absolute path, size and mtime of the source file plus a hash of its first,
+    middle and last 64 KiB. Each entry is a raw blob of a JSON header followed by the aligned vertex and
+    triangle arrays and the entity block, so a hit is one read and a few zero copy array views."""
+    CACHE_VERSION = 1
+    MAGIC = b"RMCACHE1"
+    ALIGNMENT = 64
+    SAMPLE_SIZE = 64 * 1024
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_content_hash(self, file_path, file_size):
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(file_path, "rb") as rmesh_stream:
+            if file_size <= self.SAMPLE_SIZE * 3:
+                hasher.update(rmesh_stream.read())
+            else:
+                hasher.update(rmesh_stream.read(self.SAMPLE_SIZE))
+                rmesh_stream.seek(file_size // 2)
+                hasher.update(rmesh_stream.read(self.SAMPLE_SIZE))
+                rmesh_stream.seek(-self.SAMPLE_SIZE, os.SEEK_END)
+                hasher.update(rmesh_stream.read(self.SAMPLE_SIZE))
+
+        return hasher.hexdigest()
+
+    def get_entry_path(self, file_path):
+        """Return the cache file for the current state of file_path and the name prefix shared by all its states"""
+        file_path = os.path.abspath(file_path)
+        file_stat = os.stat(file_path)
+        path_hash = hashlib.blake2b(file_path.encode("utf-8"), digest_size=8).hexdigest()
+        state = "%s|%s|%s|%s|%s" % (self.CACHE_VERSION, file_stat.st_size, file_stat.st_mtime_ns,
+                                    self.get_content_hash(file_path, file_stat.st_size), file_path)
+        state_hash = hashlib.blake2b(state.encode("utf-8"), digest_size=16).hexdigest()
+
+        return os.path.join(self.cache_dir, "%s_%s.rmcache" % (path_hash, state_hash)), path_hash
+
+    def load(self, file_path, entry_key=None):
+        """Return the cached RMesh for file_path or None on a miss. entry_key is a get_entry_path result
+        for the same file, so a miss followed by store hashes the file once"""
+        try:
+            entry_path = (entry_key or self.get_entry_path(file_path))[0]
+            with open(entry_path, "rb") as entry_stream:
+                entry_buffer = entry_stream.read()
+
+        except OSError:
+            return None
+
+        try:
+            header_size = UNSIGNED_INT_STRUCT.unpack_from(entry_buffer, len(self.MAGIC))[0]
+            if not entry_buffer.startswith(self.MAGIC):
+                raise ValueError("Bad cache entry magic")
+
+            header_offset = len(self.MAGIC) + UNSIGNED_INT_STRUCT.size
+            header = json.loads(entry_buffer[header_offset:header_offset + header_size].decode("utf-8"))
+            is_rmesh2 = header["rmesh_file_type"] == "RoomMesh2"
+            dtypes = {"mesh": get_vertex_dtype(is_rmesh2), "collision": COLLISION_VERTEX_DTYPE}
+            arrays = {}
+            for array_name, count, offset in header["arrays"]:
+                if array_name.endswith("_triangles"):
+                    dtype = TRIANGLE_DTYPE
                 else:
-                    write_string(rmesh_stream, entity_dict["euler_rotation"])
-                    write_unsigned_int(rmesh_stream, entity_dict["inner_cone_angle"])
-                    write_unsigned_int(rmesh_stream, entity_dict["outer_cone_angle"])
-
-            elif entity_dict["entity_type"] == "soundemitter":
-                write_vector(rmesh_stream, entity_dict["position"])
-                write_unsigned_int(rmesh_stream, entity_dict["id"])
-                write_float(rmesh_stream, entity_dict["range"])
-
-            elif entity_dict["entity_type"] == "model":
-                write_string(rmesh_stream, entity_dict["model_name"])
-                if is_rmesh2:
-                    write_vector(rmesh_stream, entity_dict["position"])
-                    write_vector(rmesh_stream, entity_dict["euler_rotation"])
-                    write_vector(rmesh_stream, entity_dict["scale"])
-
-            elif entity_dict["entity_type"] == "mesh":
-                write_vector(rmesh_stream, entity_dict["position"])
-                write_string(rmesh_stream, entity_dict["model_name"])
-                write_vector(rmesh_stream, entity_dict["euler_rotation"])
-                write_vector(rmesh_stream, entity_dict["scale"])
-                write_byte(rmesh_stream, entity_dict["has_collision"])
-                write_unsigned_int(rmesh_stream, entity_dict["fx"])
-                write_string(rmesh_stream, entity_dict["texture_name"])
+                    dtype = dtypes[array_name.split("_")[0]]
+
+                arrays[array_name] = np.frombuffer(entry_buffer, dtype=dtype, count=count, offset=offset)
+
+            rmesh_dict = RMesh(header["rmesh_file_type"])
+            for mesh_idx, textures in enumerate(header["textures"]):
+                rmesh_dict.meshes.append(MeshSection(textures, arrays["mesh_%s_vertices" % mesh_idx], arrays["mesh_%s_triangles" % mesh_idx]))
+
+            for collision_idx in range(header["collision_mesh_count"]):
+                rmesh_dict.collision_meshes.append(CollisionMesh(arrays["collision_%s_vertices" % collision_idx], arrays["collision_%s_triangles" % collision_idx]))
+
+            entity_offset = header["entity_offset"]
+            for entity_idx in range(header["entity_count"]):
+                entity_dict, entity_offset = unpack_entity_from(entry_buffer, entity_offset, is_rmesh2)
+                rmesh_dict.entities.append(entity_dict)
+
+        except Exception:
+            # A damaged or outdated entry is treated as a miss and rebuilt. It may already have been evicted
+            # or the cache directory may be read only.
+            with contextlib.suppress(OSError):
+                os.remove(entry_path)
+
+            return None
+
+        # Touch the entry so eviction drops the least recently used rooms first.
+        with contextlib.suppress(OSError):
+            os.utime(entry_path)
+
+        return rmesh_dict
+
+    def store(self, file_path, rmesh_dict, entry_key=None):
+        """Write rmesh_dict to the cache. Cache I/O errors are swallowed since the room has already been
+        decoded. Returns True if the entry was written"""
+        temp_path = None
+        try:
+            entry_path, path_hash = entry_key or self.get_entry_path(file_path)
+            temp_path = "%s.%s.tmp" % (entry_path, os.getpid())
+            self.write_entry(temp_path, rmesh_dict)
+            os.replace(temp_path, entry_path)
+            temp_path = None
+
+            # Older states of the same room can never be hit again.
+            for entry_name in os.listdir(self.cache_dir):
+                if entry_name.startswith("%s_" % path_hash) and entry_name.endswith(".rmcache") and os.path.join(self.cache_dir, entry_name) != entry_path:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(os.path.join(self.cache_dir, entry_name))
+
+            self.evict()
+
+        except OSError:
+            return False
+
+        finally:
+            if temp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(temp_path)
+
+        return True
+
+    def write_entry(self, entry_path, rmesh_dict):
+        is_rmesh2 = rmesh_dict["rmesh_file_type"] == "RoomMesh2"
+
+        arrays = []
+        for mesh_idx, mesh_dict in enumerate(rmesh_dict["meshes"]):
+            arrays.append(("mesh_%s_vertices" % mesh_idx, vertices_to_array(mesh_dict["vertices"], get_vertex_dtype(is_rmesh2))))
+            arrays.append(("mesh_%s_triangles" % mesh_idx, triangles_to_array(mesh_dict["triangles"])))
+
+        for collision_idx, collision_dict in enumerate(rmesh_dict["collision_meshes"]):
+            arrays.append(("collision_%s_vertices" % collision_idx, vertices_to_array(collision_dict["vertices"], COLLISION_VERTEX_DTYPE)))
+            arrays.append(("collision_%s_triangles" % collision_idx, triangles_to_array(collision_dict["triangles"])))
+
+        entity_stream = io.BytesIO()
+        for entity_dict in rmesh_dict["entities"]:
+            write_entity(entity_stream, entity_dict, is_rmesh2)
+
+        # Array offsets depend on the header size, so pad the header with room for a 20 digit number per offset.
+        header = {
+            "rmesh_file_type": rmesh_dict["rmesh_file_type"],
+            "textures": [mesh_dict["textures"] for mesh_dict in rmesh_dict["meshes"]],
+            "collision_mesh_count": len(rmesh_dict["collision_meshes"]),
+            "entity_count": len(rmesh_dict["entities"]),
+            "entity_offset": 0,
+            "arrays": [[array_name, len(array), 0] for array_name, array in arrays]
+        }
+        header_limit = len(json.dumps(header)) + 20 * (len(arrays) + 1)
+        offset = len(self.MAGIC) + UNSIGNED_INT_STRUCT.size + header_limit
+        for array_header, (array_name, array) in zip(header["arrays"], arrays):
+            offset += -offset % self.ALIGNMENT
+            array_header[2] = offset
+            offset += array.nbytes
+
+        header["entity_offset"] = offset
+        header_bytes = json.dumps(header).encode("utf-8").ljust(header_limit)
+
+        with open(entry_path, "wb") as entry_stream:
+            entry_stream.write(self.MAGIC)
+            entry_stream.write(UNSIGNED_INT_STRUCT.pack(len(header_bytes)))
+            entry_stream.write(header_bytes)
+            for array_header, (array_name, array) in zip(header["arrays"], arrays):
+                entry_stream.write(bytes(array_header[2] - entry_stream.tell()))
+                entry_stream.write(array.tobytes())
+
+            entry_stream.write(entity_stream.getvalue())
+
+    def get_entries(self):
+        """Return (mtime, size, path) of every cache entry, least recently used first"""
+        entries = []
+        for entry_name in os.listdir(self.cache_dir):
+            if entry_name.endswith(".rmcache"):
+                entry_path = os.path.join(self.cache_dir, entry_name)
+                try:
+                    entry_stat = os.stat(entry_path)
+                except FileNotFoundError:
+                    continue
+
+                entries.append((entry_stat.st_mtime_ns, entry_stat.st_size, entry_path))
+
+        entries.sort()
+
+        return entries
+
+    def evict(self):
+        entries = self.get_entries()
+        total_bytes = sum(entry[1] for entry in entries)
+        for entry_mtime, entry_size, entry_path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(entry_path)
+
+            total_bytes -= entry_size
+
+    def clear(self):
+        for entry_mtime, entry_size, entry_path in self.get_entries():
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(entry_path)
@@ -0,0 +1,223 @@
+#!/usr/bin/python3
+"""Headless batch converter for RMESH files, no Blender required.
+
+Run from the addon directory:
+    python -m rmesh_cli rooms/ -o json_out/
+    python -m rmesh_cli --to rmesh json_out/ -o rooms_rebuilt/
+    python -m rmesh_cli --to summary "rooms/**/*.rmesh"
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import itertools
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from .process_rmesh import read_rmesh, write_rmesh, scan_rmesh
+except ImportError:
+    from process_rmesh import read_rmesh, write_rmesh, scan_rmesh
+
+INPUT_EXTENSIONS = {
+    "json": (".rmesh",),
+    "summary": (".rmesh",),
+    "rmesh": (".json",)
+}
+
+OUTPUT_EXTENSIONS = {
+    "json": ".json",
+    "rmesh": ".rmesh"
+}
+
+def get_glob_root(input_pattern):
+    """Return the leading directories of a glob pattern that hold no wildcards"""
+    drive, pattern_path = os.path.splitdrive(input_pattern)
+    root_parts = []
+    for part in pattern_path.replace("\\", "/").split("/")[:-1]:
+        if glob.has_magic(part):
+            break
+
+        root_parts.append(part)
+
+    return drive + ("/".join(root_parts) if root_parts != [""] else "/")
+
+def collect_inputs(input_patterns, mode):
+    """Expand files, directories and glob patterns into (input_path, relative_path) pairs"""
+    extensions = INPUT_EXTENSIONS[mode]
+    inputs = []
+    seen = set()
+
+    def add_input(file_path, relative_path):
+        file_path = os.path.abspath(file_path)
+        if file_path not in seen:
+            seen.add(file_path)
+            inputs.append((file_path, relative_path))
+
+    for input_pattern in input_patterns:
+        if os.path.isdir(input_pattern):
+            for root, dirs, files in os.walk(input_pattern):
+                dirs.sort()
+                for file in sorted(files):
+                    if file.lower().endswith(extensions):
+                        file_path = os.path.join(root, file)
+                        add_input(file_path, os.path.relpath(file_path, input_pattern))
+
+        elif os.path.isfile(input_pattern):
+            add_input(input_pattern, os.path.basename(input_pattern))
+
+        else:
+            glob_root = get_glob_root(input_pattern)
+            for file_path in sorted(glob.glob(input_pattern, recursive=True)):
+                if os.path.isfile(file_path) and file_path.lower().endswith(extensions):
+                    add_input(file_path, os.path.relpath(file_path, glob_root or os.curdir))
+
+    return inputs
+
+def get_output_path(input_path, relative_path, output_dir, mode):
+    if mode not in OUTPUT_EXTENSIONS:
+        return None
+
+    if output_dir is None:
+        base_path = input_path
+    else:
+        base_path = os.path.join(output_dir, relative_path)
+
+    return "%s%s" % (os.path.splitext(base_path)[0], OUTPUT_EXTENSIONS[mode])
+
+def convert_file(input_path, output_path, mode, indent=None):
+    """Worker entry point. Returns the input size and, in summary mode, the summary"""
+    input_size = os.path.getsize(input_path)
+    if mode == "summary":
+        return input_size, scan_rmesh(input_path)
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    if mode == "json":
+        rmesh_dict = read_rmesh(input_path)
+        with open(output_path, "w", encoding="utf-8") as json_stream:
+            json.dump(rmesh_dict, json_stream, indent=indent)
+
+    elif mode == "rmesh":
+        with open(input_path, "r", encoding="utf-8") as json_stream:
+            rmesh_dict = json.load(json_stream)
+
+        write_rmesh(rmesh_dict, output_path)
+
+    return input_size, None
+
+def find_duplicate_outputs(jobs):
+    """Return {output_path: [input_path, ...]} for outputs written by more than one input"""
+    inputs_by_output = {}
+    for input_path, output_path in jobs:
+        if output_path is not None:
+            inputs_by_output.setdefault(os.path.normcase(os.path.abspath(output_path)), []).append(input_path)
+
+    return {output_path: input_paths for output_path, input_paths in inputs_by_output.items() if len(input_paths) > 1}
+
+def run_jobs(jobs, mode, indent, workers, max_in_flight):
+    """Run conversions across a process pool with at most max_in_flight submitted jobs. Yields (input_path, result, error)"""
+    if workers <= 1:
+        for input_path, output_path in jobs:
+            try:
+                yield input_path, convert_file(input_path, output_path, mode, indent), None
+            except Exception as error:
+                yield input_path, None, error
+
+        return
+
+    # A crashed worker breaks the pool and fails the jobs in flight with BrokenProcessPool. Those are reported
+    # as failed and the remaining jobs continue on a new pool.
+    jobs = iter(jobs)
+    pool_broken = True
+    while pool_broken:
+        pool_broken = False
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+
+            def drain(return_when):
+                nonlocal pool_broken
+                done, not_done = wait(pending, return_when=return_when)
+                for future in done:
+                    input_path = pending.pop(future)
+                    try:
+                        yield input_path, future.result(), None
+                    except BrokenProcessPool as error:
+                        pool_broken = True
+                        yield input_path, None, error
+                    except Exception as error:
+                        yield input_path, None, error
+
+            for input_path, output_path in jobs:
+                if len(pending) >= max_in_flight:
+                    yield from drain(FIRST_COMPLETED)
+
+                if pool_broken:
+                    jobs = itertools.chain([(input_path, output_path)], jobs)
+                    break
+
+                try:
+                    pending[executor.submit(convert_file, input_path, output_path, mode, indent)] = input_path
+                except BrokenProcessPool:
+                    pool_broken = True
+                    jobs = itertools.chain([(input_path, output_path)], jobs)
+                    break
+
+            while pending:
+                yield from drain(FIRST_COMPLETED)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="rmesh_cli", description="Convert RMESH files to JSON and back, or summarize them, without Blender.")
+    parser.add_argument("inputs", nargs="+", help="Files, directories or glob patterns to process")
+    parser.add_argument("--to", dest="mode", choices=("json", "rmesh", "summary"), default="json", help="Output format. summary prints one JSON line per file")
+    parser.add_argument("-o", "--output-dir", default=None, help="Directory to write into, keeping the layout below input directories. Defaults to next to each input")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Maximum number of files submitted to the pool at once. Defaults to twice the worker count")
+    parser.add_argument("--indent", type=int, default=None, help="Indent JSON output")
+    args = parser.parse_args(argv)
+
+    inputs = collect_inputs(args.inputs, args.mode)
+    if not inputs:
+        print("No input files found", file=sys.stderr)
+        return 1
+
+    workers = max(1, args.jobs)
+    max_in_flight = args.max_in_flight or workers * 2
+    jobs = [(input_path, get_output_path(input_path, relative_path, args.output_dir, args.mode)) for input_path, relative_path in inputs]
+    duplicate_outputs = find_duplicate_outputs(jobs)
+    if duplicate_outputs:
+        for output_path, input_paths in sorted(duplicate_outputs.items()):
+            print("Output %s would be written by %s" % (output_path, ", ".join(input_paths)), file=sys.stderr)
+
+        return 1
+
+    start_time = time.perf_counter()
+    processed_count = 0
+    failed_count = 0
+    processed_bytes = 0
+    for input_path, result, error in run_jobs(jobs, args.mode, args.indent, workers, max(1, max_in_flight)):
+        if error is not None:
+            failed_count += 1
+            print("FAILED %s: %s: %s" % (input_path, type(error).__name__, error), file=sys.stderr)
+            continue
+
+        input_size, summary = result
+        processed_count += 1
+        processed_bytes += input_size
+        if summary is not None:
+            print(json.dumps(summary))
+
+    elapsed = max(time.perf_counter() - start_time, 1e-9)
+    print("Processed %s files (%s failed) in %.2fs: %.1f files/s, %.2f MB/s" % (
+        processed_count, failed_count, elapsed, processed_count / elapsed, processed_bytes / elapsed / (1024 * 1024)), file=sys.stderr)
+
+    return 1 if failed_count else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
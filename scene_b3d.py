@@ -1,54 +1,52 @@
 import bpy
+import numpy as np
 
 from math import radians, cos, sin
-from bpy_extras.io_utils import unpack_list
-from mathutils import Euler, Matrix, Vector
-
-def flip(v):
-    return ((v[0],v[2],v[1]) if len(v)<4 else (v[0], v[1],v[3],v[2]))
-
-def flip_all(v):
-    return [y for y in [flip(x) for x in v]]
+from mathutils import Euler
 
 def import_mesh(node, material_mapping, bm):
     mesh = bpy.data.meshes.new("temp_mesh")
 
-    # join face arrays
-    faces = []
-    for face in node.faces:
-        faces.extend(face.indices)
-
-    vertices = [Matrix.Scale(-0.00625, 4) @ Vector(vertex) for vertex in node.vertices]
-
-    # create mesh from data
-    mesh.from_pydata(vertices, [], flip_all(faces))
-    for poly in mesh.polygons:
-        poly.use_smooth = True
+    # join face arrays, winding is flipped to match the mirrored scale below
+    faces = np.concatenate([face.indices for face in node.faces])[:, (0, 2, 1)]
+    loop_vertices = faces.ravel().astype(np.int32)
+    face_count = len(faces)
+    vertex_count = len(node.vertices)
+
+    mesh.vertices.add(vertex_count)
+    mesh.vertices.foreach_set('co', (node.vertices * -0.00625).astype(np.float32).ravel())
+    mesh.loops.add(len(loop_vertices))
+    mesh.loops.foreach_set('vertex_index', loop_vertices)
+    mesh.polygons.add(face_count)
+    mesh.polygons.foreach_set('loop_start', np.arange(0, len(loop_vertices), 3, dtype=np.int32))
+    mesh.polygons.foreach_set('use_smooth', np.ones(face_count, dtype=bool))
+    mesh.update(calc_edges=True)
 
     # assign normals
-    mesh.vertices.foreach_set('normal', unpack_list(node.normals))
+    if len(node.normals) == vertex_count:
+        mesh.vertices.foreach_set('normal', node.normals.astype(np.float32).ravel())
 
-    # assign uv coordinates
-    uvs = [(0,0) if len(uv)==0 else (uv[0], 1-uv[1]) for uv in node.uvs]
-    uvlist = [i for poly in mesh.polygons for vidx in poly.vertices for i in uvs[vidx]]
-    mesh.uv_layers.new().data.foreach_set('uv', uvlist)
+    # assign uv coordinates, models without a uv set get (0, 0)
+    uvs = np.zeros((vertex_count, 2), dtype=np.float32)
+    if len(node.uvs) == vertex_count and node.uvs.shape[1] >= 2:
+        uvs[:, 0] = node.uvs[:, 0]
+        uvs[:, 1] = 1 - node.uvs[:, 1]
+    mesh.uv_layers.new().data.foreach_set('uv', uvs[loop_vertices].ravel())
 
     # adding object materials (insert-ordered)
     for key, value in material_mapping.items():
         mesh.materials.append(bpy.data.materials[value])
 
-    # assign material_indexes
-    poly = 0
-    for face in node.faces:
-        for _ in face.indices:
-            mesh.polygons[poly].material_index = face.brush_id
-            poly += 1
+    # assign material_indexes, faces without a brush (-1) use the first slot
+    brush_ids = [max(face.brush_id, 0) for face in node.faces]
+    face_counts = [len(face.indices) for face in node.faces]
+    mesh.polygons.foreach_set('material_index', np.repeat(np.array(brush_ids, dtype=np.int32), face_counts))
 
     bm.from_mesh(mesh)
     bpy.data.meshes.remove(mesh)
 
 def import_node_recursive(node, material_mapping, bm):
-    if 'vertices' in node and 'faces' in node:
+    if node.vertices is not None and node.faces:
         import_mesh(node, material_mapping, bm)
 
     for x in node.nodes:
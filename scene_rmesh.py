@@ -2,13 +2,16 @@ import re
 import os
 import bpy
 import bmesh
+import hashlib
 import colorsys
+import numpy as np
 
 from mathutils import Euler, Matrix, Vector, Quaternion
-from .process_rmesh import TextureType, write_rmesh, read_rmesh
+from .process_rmesh import TextureType, RMeshCache, write_rmesh, read_rmesh_arrays, vertices_to_array, get_vertex_dtype
 from . import ObjectType
 from math import radians, pi, degrees, asin, atan2
-from .process_b3d import B3DTree
+from .process_b3d import B3DBounds, B3DModelCache, GEOMETRY_CHUNKS
+from .asset_index import AssetIndex, FilePrefetcher
 from .scene_b3d import import_node_recursive
 from bpy_extras.image_utils import load_image
 
@@ -114,6 +117,79 @@ def get_output_material_node(mat):
 
     return output_material_node
 
+# Index of every file below the game path, rechecked for changes at most every few seconds so a whole
+# import resolves its assets against one scan. It is saved between sessions and revalidated incrementally.
+asset_index = None
+ASSET_INDEX_MAX_AGE = 5.0
+
+def get_asset_index_path(game_path):
+    index_dir = bpy.utils.user_resource('CONFIG', path="io_scene_rmesh", create=True)
+    path_hash = hashlib.blake2b(game_path.encode("utf-8"), digest_size=8).hexdigest()
+
+    return os.path.join(index_dir, "asset_index_%s.json" % path_hash)
+
+def get_asset_index(rebuild=False):
+    global asset_index
+    game_path = bpy.context.preferences.addons["io_scene_rmesh"].preferences.game_path
+    if is_string_empty(game_path):
+        return None
+
+    index_path = get_asset_index_path(game_path)
+    if asset_index is None or asset_index.root != game_path:
+        asset_index = AssetIndex(game_path)
+        if not rebuild:
+            asset_index.load(index_path)
+
+    if rebuild:
+        asset_index.scan()
+        index_changed = True
+    else:
+        index_changed = asset_index.refresh(ASSET_INDEX_MAX_AGE)
+
+    if index_changed:
+        try:
+            asset_index.save(index_path)
+        except OSError:
+            pass
+
+    return asset_index
+
+def find_image(file_name):
+    """Load an image found anywhere below the game path, None if there is no such file"""
+    game_index = get_asset_index()
+    file_path = game_index.find(file_name) if game_index is not None else ""
+    if not file_path:
+        return None
+
+    return load_image(file_path, check_existing=True, place_holder=False)
+
+def get_prefetch_paths(rmesh_dict, section_materials, defer_textures):
+    """Return the paths of the section textures and screen images an import is going to load"""
+    image_names = []
+    if not defer_textures:
+        for mesh_dict in rmesh_dict["meshes"]:
+            mat = section_materials.get(get_texture_key(mesh_dict["textures"]))
+            if mat is None or has_deferred_textures(mat):
+                lightmap_name, diffuse_name, diffuse_type = get_texture_names(mesh_dict["textures"])
+                image_names.extend((diffuse_name, lightmap_name))
+
+    for entity_dict in rmesh_dict["entities"]:
+        if entity_dict["entity_type"] == "screen":
+            image_names.append(entity_dict["texture_name"])
+
+    return find_files(image_names)
+
+def get_model_texture_paths(models):
+    """Return the paths of the textures used by parsed entity models"""
+    return find_files(os.path.basename(texture.name) for data in models for texture in data.textures or [])
+
+def find_files(file_names):
+    game_index = get_asset_index()
+    if game_index is None:
+        return []
+
+    return [game_index.find(file_name) for file_name in file_names if file_name]
+
 def get_file(file_name, is_image=True):
     file_name = os.path.basename(file_name).lower()
     result = file_name.rsplit(".", 1)
@@ -122,14 +198,9 @@ def get_file(file_name, is_image=True):
 
     file_asset = None
     file_path = ""
-    game_path = bpy.context.preferences.addons["io_scene_rmesh"].preferences.game_path
-
-    if not is_string_empty(game_path):
-        for root, dirs, files in os.walk(game_path):
-            for file in files:
-                if file.lower() == file_name:
-                    file_path = os.path.join(root, file)
-                    break
+    game_index = get_asset_index()
+    if game_index is not None:
+        file_path = game_index.find(file_name)
 
     if is_image:
         if os.path.isfile(file_path):
@@ -260,7 +331,16 @@ def export_scene(context, filepath, game_title, report):
 
                         if image_node_a == image_node_b:
                             diffuse_texture_dict["texture_type"] = TextureType.transparent.value
- 
+
+                if has_deferred_textures(mat):
+                    if mat["rmesh_lightmap_name"]:
+                        lightmap_texture_dict["texture_type"] = TextureType.lightmap.value
+                        lightmap_texture_dict["texture_name"] = mat["rmesh_lightmap_name"]
+
+                    if mat["rmesh_diffuse_name"]:
+                        diffuse_texture_dict["texture_type"] = mat["rmesh_diffuse_type"]
+                        diffuse_texture_dict["texture_name"] = mat["rmesh_diffuse_name"]
+
                 section_data[mat_name]["textures"].append(lightmap_texture_dict)
                 section_data[mat_name]["textures"].append(diffuse_texture_dict)
 
@@ -444,15 +524,359 @@ def export_scene(context, filepath, game_title, report):
     report({'INFO'}, "Export completed successfully")
     return {'FINISHED'}
 
-def import_scene(context, filepath, report):
-    rmesh_dict = read_rmesh(filepath)
+# Parsed entity models and the mesh datablocks built from them outlive a single import so rooms sharing props
+# only parse and build each model once per session.
+b3d_model_cache = B3DModelCache()
+model_meshes = {}
+proxy_meshes = {}
+
+# Corner order is x * 4 + y * 2 + z, faces wind outwards.
+BOX_FACES = ((0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3))
+
+def get_model_key(model_path):
+    file_stat = os.stat(model_path)
+    return "%s|%s|%s" % (os.path.abspath(model_path), file_stat.st_mtime_ns, file_stat.st_size)
+
+def get_model_mesh(model_key):
+    """Return the mesh datablock built for model_key by an earlier import if it still exists"""
+    mesh = bpy.data.meshes.get(model_meshes.get(model_key, ""))
+    if mesh is None or mesh.get("rmesh_model_key") != model_key:
+        return None
+
+    return mesh
+
+def build_model_mesh(model_path, mesh_name, data, random_color_gen, images, material_mapping):
+    """Build the mesh datablock for an entity model. data is the parsed model if it was prefetched.
+    The mesh is only registered for reuse once it has been filled"""
+    model_key = get_model_key(model_path)
+    if data is None:
+        data = b3d_model_cache.parse(model_path, GEOMETRY_CHUNKS)
+
+    for i, texture in enumerate(data.textures or []):
+        texture_name = os.path.basename(texture.name)
+        for mat in data.materials or []:
+            if mat.tids[0]==i:
+                images[i] = (texture_name, find_image(texture_name))
+
+    for i, mat in enumerate(data.materials or []):
+        material = bpy.data.materials.new(mat.name)
+        material.diffuse_color = random_color_gen.next()
+        material_mapping[i] = material.name
+        #material.diffuse_color = mat.rgba #B3D models have a material color but we're not exporting these so who cares.
+        material.blend_method = 'BLEND' if mat.rgba[3] < 1.0 else 'OPAQUE'
+
+        tid = mat.tids[0] if len(mat.tids) else -1
+
+        if tid in images:
+            name, image = images[tid]
+            texture = bpy.data.textures.new(name=name, type='IMAGE')
+            material.use_nodes = True
+            bsdf = material.node_tree.nodes["Principled BSDF"]
+            texImage = material.node_tree.nodes.new('ShaderNodeTexImage')
+            texImage.image = image
+            material.node_tree.links.new(bsdf.inputs['Base Color'], texImage.outputs['Color'])
+
+    ob_data = bpy.data.meshes.new(mesh_name)
+    bm = bmesh.new()
+    try:
+        for key, value in material_mapping.items():
+            ob_data.materials.append(bpy.data.materials[value])
+
+        import_node_recursive(data, material_mapping, bm)
+        bm.to_mesh(ob_data)
+    except Exception:
+        bpy.data.meshes.remove(ob_data)
+        raise
+    finally:
+        bm.free()
+
+    ob_data["rmesh_model_key"] = model_key
+    model_meshes[model_key] = ob_data.name
+
+    return ob_data
+
+def get_proxy_mesh(model_path, mesh_name):
+    """Return a box mesh around an entity model from a bounds-only scan of its vertices, shared between imports"""
+    model_key = get_model_key(model_path)
+    ob_data = bpy.data.meshes.get(proxy_meshes.get(model_key, ""))
+    if ob_data is not None and ob_data.get("rmesh_proxy_key") == model_key:
+        return ob_data
+
+    # Scan before creating the mesh so a failed scan does not leave an empty proxy registered for reuse.
+    bounds = B3DBounds().parse(model_path)
+    ob_data = bpy.data.meshes.new(mesh_name)
+    if bounds is not None:
+        # Same mirrored scale as the full model import.
+        corners = (bounds[0] * -0.00625, bounds[1] * -0.00625)
+        low, high = np.minimum(*corners), np.maximum(*corners)
+        vertices = [(x, y, z) for x in (low[0], high[0]) for y in (low[1], high[1]) for z in (low[2], high[2])]
+        ob_data.from_pydata(vertices, [], BOX_FACES)
+
+    ob_data["rmesh_proxy_key"] = model_key
+    proxy_meshes[model_key] = ob_data.name
+
+    return ob_data
+
+def load_entity_geometry(context, selected_only, report):
+    """Swap the proxy mesh of entity mesh objects for the full model geometry"""
+    objects = context.selected_objects if selected_only else context.scene.objects
+    proxies = [ob for ob in objects if ob.rmesh.is_proxy and ObjectType(int(ob.rmesh.object_type)) == ObjectType.entity_mesh]
+
+    model_paths = {ob.name: bpy.path.abspath(ob.rmesh.model_path) for ob in proxies}
+    pending_models = [model_path for model_path in set(model_paths.values()) if os.path.isfile(model_path) and get_model_mesh(get_model_key(model_path)) is None]
+    prefetched_models = b3d_model_cache.prefetch(pending_models, GEOMETRY_CHUNKS) if pending_models else {}
+
+    random_color_gen = RandomColorGenerator()
+    loaded_count = 0
+    for ob in proxies:
+        model_path = model_paths[ob.name]
+        if not os.path.isfile(model_path):
+            report({'WARNING'}, "Model for %s was not found: %s" % (ob.name, model_path))
+            continue
+
+        ob_data = get_model_mesh(get_model_key(model_path))
+        if ob_data is None:
+            ob_data = build_model_mesh(model_path, ob.name, prefetched_models.get(model_path), random_color_gen, {}, {})
+
+        ob.data = ob_data
+        ob.display_type = 'TEXTURED'
+        ob.rmesh.is_proxy = False
+        loaded_count += 1
+
+    report({'INFO'}, "Loaded geometry for %s entity meshes" % loaded_count)
+    return {'FINISHED'}
+
+def get_room_cache():
+    addon_prefs = bpy.context.preferences.addons["io_scene_rmesh"].preferences
+    if not addon_prefs.use_room_cache:
+        return None
+
+    cache_dir = bpy.utils.user_resource('DATAFILES', path="io_scene_rmesh/room_cache", create=True)
+
+    return RMeshCache(cache_dir, addon_prefs.room_cache_size * 1024 * 1024)
+
+def get_texture_names(textures):
+    """Return the lightmap name, diffuse name and diffuse type of a section texture list"""
+    lightmap_name = textures[0]["texture_name"] if len(textures) > 0 else ""
+    diffuse_name = textures[1]["texture_name"] if len(textures) > 1 else ""
+    diffuse_type = textures[1]["texture_type"] if len(textures) > 1 else TextureType.none.value
+
+    return lightmap_name, diffuse_name, diffuse_type
+
+def get_texture_key(textures):
+    """Materials are shared by sections with the same diffuse name, diffuse type and lightmap name"""
+    lightmap_name, diffuse_name, diffuse_type = get_texture_names(textures)
+
+    return "%s|%s|%s" % (diffuse_name.lower(), diffuse_type, lightmap_name.lower())
+
+def get_section_materials():
+    """Return the section materials already in the file by texture key, from this or any earlier import"""
+    return {mat["rmesh_texture_key"]: mat for mat in bpy.data.materials if "rmesh_texture_key" in mat}
+
+DEFERRED_TEXTURE_PROPS = ("rmesh_deferred_textures", "rmesh_lightmap_name", "rmesh_diffuse_name", "rmesh_diffuse_type")
+
+def load_section_textures(mat, lightmap_name, diffuse_name, diffuse_type, error_log, report=None):
+    """Add the lightmap and diffuse image nodes to a section material. Images are shared through get_file.
+    Returns the lightmap and diffuse names that could not be found, empty when loaded or unused"""
+    missing_lightmap_name = ""
+    missing_diffuse_name = ""
+    output_material_node = get_output_material_node(mat)
+    bdsf_principled = get_linked_node(output_material_node, "Surface", "BSDF_PRINCIPLED")
+
+    texture_lightmap_data = get_file(lightmap_name)
+    if texture_lightmap_data:
+        texture_lightmap = mat.node_tree.nodes.new("ShaderNodeTexImage")
+        texture_lightmap.image = texture_lightmap_data
+        texture_lightmap.image.alpha_mode = 'CHANNEL_PACKED'
+        texture_lightmap.location = (-720.0, -320.0)
+    elif len(lightmap_name) > 0:
+        missing_lightmap_name = lightmap_name
+        error_log.add('Failed to retrive "%s"' % lightmap_name)
+
+    texture_diffuse_data = get_file(diffuse_name)
+    if texture_diffuse_data:
+        texture_diffuse = mat.node_tree.nodes.new("ShaderNodeTexImage")
+        texture_diffuse.image = texture_diffuse_data
+        texture_diffuse.image.alpha_mode = 'CHANNEL_PACKED'
+        texture_diffuse.location = (-720.0, 0.0)
+        connect_inputs(mat.node_tree, texture_diffuse, "Color", bdsf_principled, "Base Color")
+        if diffuse_type == TextureType.transparent:
+            connect_inputs(mat.node_tree, texture_diffuse, "Alpha", bdsf_principled, "Alpha")
+    elif len(diffuse_name) > 0:
+        missing_diffuse_name = diffuse_name
+        error_log.add('Failed to retrive "%s"' % diffuse_name)
+        if report is not None:
+            report({'WARNING'}, 'Failed to retrive "%s"' % diffuse_name)
+
+    return missing_lightmap_name, missing_diffuse_name
+
+def set_deferred_textures(mat, lightmap_name, diffuse_name, diffuse_type):
+    """Store the textures a section material still has to load, or clear the deferred state if there are none.
+    Until the diffuse texture is loaded the random material color is used as the base color"""
+    if not lightmap_name and not diffuse_name:
+        for prop_name in DEFERRED_TEXTURE_PROPS:
+            if prop_name in mat:
+                del mat[prop_name]
+
+        return
+
+    if diffuse_name:
+        bdsf_principled = get_linked_node(get_output_material_node(mat), "Surface", "BSDF_PRINCIPLED")
+        if bdsf_principled is not None:
+            bdsf_principled.inputs["Base Color"].default_value = mat.diffuse_color
+
+    mat["rmesh_deferred_textures"] = True
+    mat["rmesh_lightmap_name"] = lightmap_name
+    mat["rmesh_diffuse_name"] = diffuse_name
+    mat["rmesh_diffuse_type"] = diffuse_type
+
+def build_section_material(material_name, texture_key, textures, random_color_gen, error_log, report, defer_textures=False):
+    """Create a section material. With defer_textures, or for textures that cannot be found, the texture names
+    are stored on the material until load_deferred_textures adds the image nodes"""
+    mat = bpy.data.materials.new(name=material_name)
+    mat.diffuse_color = random_color_gen.next()
+    mat["rmesh_texture_key"] = texture_key
+
+    mat.use_nodes = True
+    for node in mat.node_tree.nodes:
+        mat.node_tree.nodes.remove(node)
+
+    output_material_node = get_output_material_node(mat)
+    output_material_node.location = Vector((0.0, 0.0))
+
+    bdsf_principled = get_linked_node(output_material_node, "Surface", "BSDF_PRINCIPLED")
+    if bdsf_principled is None:
+        bdsf_principled = mat.node_tree.nodes.new("ShaderNodeBsdfPrincipled")
+        connect_inputs(mat.node_tree, bdsf_principled, "BSDF", output_material_node, "Surface")
+
+    bdsf_principled.location = (-440.0, 0.0)
+
+    lightmap_name, diffuse_name, diffuse_type = get_texture_names(textures)
+    if not defer_textures:
+        lightmap_name, diffuse_name = load_section_textures(mat, lightmap_name, diffuse_name, TextureType(diffuse_type), error_log, report)
+
+    set_deferred_textures(mat, lightmap_name, diffuse_name, diffuse_type)
+
+    return mat
+
+def has_deferred_textures(mat):
+    return mat is not None and bool(mat.get("rmesh_deferred_textures"))
+
+def load_deferred_textures(materials, error_log, report=None):
+    """Add the image nodes of section materials with deferred textures. Textures that still cannot be found
+    stay deferred for the next attempt. Returns the number of materials that are now fully loaded"""
+    loaded_count = 0
+    for mat in materials:
+        if not has_deferred_textures(mat):
+            continue
+
+        diffuse_type = mat["rmesh_diffuse_type"]
+        lightmap_name, diffuse_name = load_section_textures(mat, mat["rmesh_lightmap_name"], mat["rmesh_diffuse_name"], TextureType(diffuse_type), error_log, report)
+        set_deferred_textures(mat, lightmap_name, diffuse_name, diffuse_type)
+        if not has_deferred_textures(mat):
+            loaded_count += 1
+
+    return loaded_count
+
+def load_textures(context, selected_only, report):
+    """Load the textures of deferred section materials on the selected objects or in the whole file"""
+    if selected_only:
+        materials = {slot.material for ob in context.selected_objects for slot in ob.material_slots}
+    else:
+        materials = bpy.data.materials
+
+    error_log = set()
+    loaded_count = load_deferred_textures(materials, error_log)
+    for error in sorted(error_log):
+        report({'WARNING'}, error)
+
+    report({'INFO'}, "Loaded textures for %s materials" % loaded_count)
+    return {'FINISHED'}
+
+def transform_positions(matrix, positions):
+    """Apply a 4x4 matrix to an (N, 3) array of positions in one step"""
+    matrix = np.array(matrix, dtype=np.float64)
+    return (positions @ matrix[:3, :3].T + matrix[:3, 3]).astype(np.float32)
+
+def get_flipped_triangles(triangle_array, offset=0):
+    """(N, 3) indices of a triangle array in Blender winding order"""
+    return np.stack((triangle_array["c"], triangle_array["b"], triangle_array["a"]), axis=1).astype(np.int32) + offset
+
+def check_triangle_indices(triangle_array, vertex_count, block_name):
+    """Raise ValueError if a triangle of a block points past the block's own vertices"""
+    if len(triangle_array) == 0:
+        return
+
+    max_index = max(int(triangle_array[field_name].max()) for field_name in triangle_array.dtype.names)
+    if max_index >= vertex_count:
+        raise ValueError("%s has a triangle index of %s but only %s vertices" % (block_name, max_index, vertex_count))
+
+def check_room_triangles(rmesh_dict):
+    for mesh_idx, mesh_dict in enumerate(rmesh_dict["meshes"]):
+        check_triangle_indices(mesh_dict["triangles"], len(mesh_dict["vertices"]), "Mesh section %s" % mesh_idx)
+
+    for coll_mesh_idx, coll_mesh_dict in enumerate(rmesh_dict["collision_meshes"]):
+        check_triangle_indices(coll_mesh_dict["triangles"], len(coll_mesh_dict["vertices"]), "Collision mesh %s" % coll_mesh_idx)
+
+def get_room_buffers(meshes, is_rmesh2, section_slots):
+    """Concatenate the vertices and triangles of every section. Returns the vertex array, the offset triangle
+    indices and the material slot of each triangle"""
+    vertex_arrays = []
+    triangle_arrays = []
+    material_indices = []
+    vertex_offset = 0
+    for mesh_idx, mesh_dict in enumerate(meshes):
+        vertex_arrays.append(vertices_to_array(mesh_dict["vertices"], get_vertex_dtype(is_rmesh2)))
+        # Once offset, a bad index would silently point at the vertices of another section.
+        check_triangle_indices(mesh_dict["triangles"], len(vertex_arrays[-1]), "Mesh section %s" % mesh_idx)
+        triangle_arrays.append(get_flipped_triangles(mesh_dict["triangles"], vertex_offset))
+        material_indices.append(np.full(len(mesh_dict["triangles"]), section_slots[mesh_idx], dtype=np.int32))
+        vertex_offset += len(vertex_arrays[-1])
+
+    if not meshes:
+        return np.empty(0, dtype=get_vertex_dtype(is_rmesh2)), np.empty((0, 3), dtype=np.int32), np.empty(0, dtype=np.int32)
+
+    return np.concatenate(vertex_arrays), np.concatenate(triangle_arrays), np.concatenate(material_indices)
+
+def fill_triangle_mesh(mesh, positions, triangles):
+    """Fill an empty mesh with smooth shaded triangles straight from arrays and return the loop vertex indices"""
+    loop_vertices = triangles.astype(np.int32).ravel()
+    mesh.vertices.add(len(positions))
+    mesh.vertices.foreach_set("co", positions.ravel())
+    mesh.loops.add(len(loop_vertices))
+    mesh.loops.foreach_set("vertex_index", loop_vertices)
+    mesh.polygons.add(len(triangles))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, len(loop_vertices), 3, dtype=np.int32))
+    mesh.polygons.foreach_set("use_smooth", np.ones(len(triangles), dtype=bool))
+    mesh.update(calc_edges=True)
+
+    return loop_vertices
+
+def import_scene(context, filepath, report, use_proxies=False, defer_textures=False):
+    # Background readers that warm the OS cache with the images an import loads. Blender reads image pixels
+    # on the first draw, so reads still queued when the import succeeds are left to finish.
+    file_prefetcher = FilePrefetcher()
+    result = {'CANCELLED'}
+    try:
+        result = import_room(context, filepath, report, use_proxies, defer_textures, file_prefetcher)
+        return result
+    finally:
+        file_prefetcher.shutdown(cancel_pending=result != {'FINISHED'})
+
+def import_room(context, filepath, report, use_proxies, defer_textures, file_prefetcher):
+    rmesh_dict = read_rmesh_arrays(filepath, get_room_cache())
+
+    # Validate before anything is added to the scene so a malformed room does not leave a partial import.
+    try:
+        check_room_triangles(rmesh_dict)
+    except ValueError as error:
+        report({'ERROR'}, str(error))
+        return {'CANCELLED'}
 
     is_rmesh2 = False
     if rmesh_dict["rmesh_file_type"] == "RoomMesh2":
         is_rmesh2 = True
 
-    game_path = bpy.context.preferences.addons["io_scene_rmesh"].preferences.game_path
-
     pivot_matrix = Matrix.Rotation(radians(90), 4, 'X') @  Matrix.Diagonal((-1.0, 1.0, 1.0, 1.0)) @ Matrix.Scale(0.00625, 4)
     pivot_matrix2 = Matrix.Rotation(radians(90), 4, 'X') @  Matrix.Diagonal((-1.0, 1.0, 1.0, 1.0))
 
@@ -469,90 +893,64 @@ def import_scene(context, filepath, report):
 
     error_log = set()
 
-    bm = bmesh.new()
-    for mesh_idx, mesh_dict in enumerate(rmesh_dict["meshes"]):
-        mesh = bpy.data.meshes.new("temp_mesh_%s" % mesh_idx)
-
-        vertices = [pivot_matrix @ Vector(vertex["position"]) for vertex in mesh_dict["vertices"]]
-        triangles = [[triangle["c"], triangle["b"], triangle["a"]] for triangle in mesh_dict["triangles"]]
-        mesh.from_pydata(vertices, [], triangles)
-
-        mat = bpy.data.materials.new(name="texture_%s" % mesh_idx)
-        mat.diffuse_color = random_color_gen.next()
-        mesh.materials.append(mat)
-        full_mesh.materials.append(mat)
-
-        mat.use_nodes = True
-        for node in mat.node_tree.nodes:
-            mat.node_tree.nodes.remove(node)
-
-        output_material_node = get_output_material_node(mat)
-        output_material_node.location = Vector((0.0, 0.0))
-
-        bdsf_principled = get_linked_node(output_material_node, "Surface", "BSDF_PRINCIPLED")
-        if bdsf_principled is None:
-            bdsf_principled = mat.node_tree.nodes.new("ShaderNodeBsdfPrincipled")
-            connect_inputs(mat.node_tree, bdsf_principled, "BSDF", output_material_node, "Surface")
-
-        bdsf_principled.location = (-440.0, 0.0)
-
-        texture_lightmap = None
-        diffuse_type = TextureType.none
-        texture_diffuse = None
-        for texture_idx, texture_dict in enumerate(mesh_dict["textures"]):
-            if texture_idx == 0:
-                lightmap_type = TextureType(texture_dict["texture_type"])
-                texture_lightmap_data = get_file(texture_dict["texture_name"])
-                if texture_lightmap_data:
-                    texture_lightmap = mat.node_tree.nodes.new("ShaderNodeTexImage")
-                    texture_lightmap.image = texture_lightmap_data
-                    texture_lightmap.image.alpha_mode = 'CHANNEL_PACKED'
-                    texture_lightmap.location = (-720.0, -320.0)
-                elif len(texture_dict["texture_name"]) > 0:
-                    error_log.add('Failed to retrive "%s"' % texture_dict["texture_name"])
-
-            elif texture_idx == 1:
-                diffuse_type = TextureType(texture_dict["texture_type"])
-                texture_diffuse_data = get_file(texture_dict["texture_name"])
-                if texture_diffuse_data:
-                    texture_diffuse = mat.node_tree.nodes.new("ShaderNodeTexImage")
-                    texture_diffuse.image = texture_diffuse_data
-                    texture_diffuse.image.alpha_mode = 'CHANNEL_PACKED'
-                    texture_diffuse.location = (-720.0, 0.0)
-                    connect_inputs(mat.node_tree, texture_diffuse, "Color", bdsf_principled, "Base Color")
-                    if diffuse_type == TextureType.transparent:
-                        connect_inputs(mat.node_tree, texture_diffuse, "Alpha", bdsf_principled, "Alpha")
-                elif len(texture_dict["texture_name"]) > 0:
-                    error_log.add('Failed to retrive "%s"' % texture_dict["texture_name"])
-                    report({'WARNING'}, 'Failed to retrive "%s"' % texture_dict["texture_name"])
-
-        layer_color = mesh.color_attributes.new("color", "BYTE_COLOR", "CORNER")
-        layer_uv_0 = mesh.uv_layers.new(name="uvmap_render")
-        layer_uv_1 = mesh.uv_layers.new(name="uvmap_lightmap")
-
-        if is_rmesh2:
-            loop_normals = [Vector() for loop in mesh.loops]
-
-        for poly in mesh.polygons:
-            poly.use_smooth = True
-            poly.material_index = mesh_idx
-            for loop_index in poly.loop_indices:
-                vert_index = mesh.loops[loop_index].vertex_index
-                vertex = mesh_dict["vertices"][vert_index]
-                layer_uv_0.data[loop_index].uv = (vertex["uv_render"][0], 1 - vertex["uv_render"][1])
-                layer_uv_1.data[loop_index].uv = (vertex["uv_lightmap"][0], 1 - vertex["uv_lightmap"][1])
-                layer_color.data[loop_index].color = (vertex["color"][0] / 255, vertex["color"][1] / 255, vertex["color"][2] / 255, 1.0)
-                if is_rmesh2:
-                    loop_normals[loop_index] = Vector(vertex["normal"])
+    # Resolve every entity model once.
+    model_paths = {}
+    for entity_dict in rmesh_dict["entities"]:
+        if entity_dict["entity_type"] == "mesh" and entity_dict["model_name"] not in model_paths:
+            model_paths[entity_dict["model_name"]] = get_file(entity_dict["model_name"], False)
 
-        if is_rmesh2:
-            mesh.normals_split_custom_set(loop_normals)
+    pending_models = []
+    if not use_proxies:
+        pending_models = [model_path for model_path in set(model_paths.values()) if model_path and get_model_mesh(get_model_key(model_path)) is None]
+    # Parse the models without a reusable mesh on a thread pool while the room geometry is built. The results
+    # are collected before the entity loop so it only does the Blender side mesh construction.
+    collect_models = b3d_model_cache.start_prefetch(pending_models, GEOMETRY_CHUNKS)
 
-        bm.from_mesh(mesh)
-        bpy.data.meshes.remove(mesh)
+    section_materials = get_section_materials()
+    file_prefetcher.start(get_prefetch_paths(rmesh_dict, section_materials, defer_textures))
 
-    bm.to_mesh(full_mesh)
-    bm.free()
+    section_slots = []
+    slot_indices = {}
+    for mesh_idx, mesh_dict in enumerate(rmesh_dict["meshes"]):
+        texture_key = get_texture_key(mesh_dict["textures"])
+        mat = section_materials.get(texture_key)
+        if mat is None:
+            diffuse_name = mesh_dict["textures"][1]["texture_name"] if len(mesh_dict["textures"]) > 1 else ""
+            material_name = os.path.splitext(os.path.basename(diffuse_name.replace("\\", "/")))[0] or "texture_%s" % mesh_idx
+            mat = section_materials[texture_key] = build_section_material(material_name, texture_key, mesh_dict["textures"], random_color_gen, error_log, report, defer_textures)
+
+        elif not defer_textures and has_deferred_textures(mat):
+            load_deferred_textures([mat], error_log, report)
+
+        if texture_key not in slot_indices:
+            slot_indices[texture_key] = len(full_mesh.materials)
+            full_mesh.materials.append(mat)
+
+        section_slots.append(slot_indices[texture_key])
+
+    # Every section goes into one vertex and triangle buffer, with triangle indices offset by the vertices
+    # of the sections before it and sections sharing a material sharing its slot.
+    vertex_array, triangles, material_indices = get_room_buffers(rmesh_dict["meshes"], is_rmesh2, section_slots)
+    loop_vertices = fill_triangle_mesh(full_mesh, transform_positions(pivot_matrix, vertex_array["position"]), triangles)
+    full_mesh.polygons.foreach_set("material_index", material_indices)
+
+    # Gather the per vertex attributes for every loop at once.
+    loop_vertex_array = vertex_array[loop_vertices]
+
+    layer_color = full_mesh.color_attributes.new("color", "BYTE_COLOR", "CORNER")
+    layer_uv_0 = full_mesh.uv_layers.new(name="uvmap_render")
+    layer_uv_1 = full_mesh.uv_layers.new(name="uvmap_lightmap")
+    for layer_uv, uv_name in ((layer_uv_0, "uv_render"), (layer_uv_1, "uv_lightmap")):
+        loop_uvs = loop_vertex_array[uv_name].astype(np.float32)
+        loop_uvs[:, 1] = 1 - loop_uvs[:, 1]
+        layer_uv.data.foreach_set("uv", loop_uvs.ravel())
+
+    loop_colors = np.ones((len(loop_vertices), 4), dtype=np.float32)
+    loop_colors[:, :3] = loop_vertex_array["color"] / 255
+    layer_color.data.foreach_set("color", loop_colors.ravel())
+
+    if is_rmesh2:
+        full_mesh.normals_split_custom_set_from_vertices(np.ascontiguousarray(vertex_array["normal"], dtype=np.float32))
 
     for coll_mesh_idx, coll_mesh_dict in enumerate(rmesh_dict["collision_meshes"]):
         coll_mesh = bpy.data.meshes.new("coll_mesh_%s" % coll_mesh_idx)
@@ -560,16 +958,15 @@ def import_scene(context, filepath, report):
         coll_object_mesh.rmesh.object_type = str(ObjectType.collision.value)
         collision_collection.objects.link(coll_object_mesh)
 
-        coll_vertices = [pivot_matrix @ Vector(coll_vertex["position"]) for coll_vertex in coll_mesh_dict["vertices"]]
-        coll_triangles = [[coll_triangle["c"], coll_triangle["b"], coll_triangle["a"]] for coll_triangle in coll_mesh_dict["triangles"]]
-        coll_mesh.from_pydata(coll_vertices, [], coll_triangles)
-        for poly in coll_mesh.polygons:
-            poly.use_smooth = True
+        coll_positions = transform_positions(pivot_matrix, coll_mesh_dict["vertices"]["position"])
+        fill_triangle_mesh(coll_mesh, coll_positions, get_flipped_triangles(coll_mesh_dict["triangles"]))
+
+    prefetched_models = collect_models()
+    file_prefetcher.start(get_model_texture_paths(prefetched_models.values()))
 
     entity_meshes = {}
     images = {}
     material_mapping = {}
-    IMAGE_SEARCH=True
     for entity_idx, entity_dict in enumerate(rmesh_dict["entities"]):
         if entity_dict["entity_type"] == "screen":
             object_mesh = bpy.data.objects.new("%s screen" % entity_idx, None)
@@ -685,49 +1082,26 @@ def import_scene(context, filepath, report):
                 object_mesh.matrix_world =  global_transform
 
         elif entity_dict["entity_type"] == "mesh":
-            model_path = get_file(entity_dict["model_name"], False)
+            model_path = model_paths[entity_dict["model_name"]]
             texture_path = get_file(entity_dict["texture_name"], False)
             ob_data = entity_meshes.get(model_path)
-            
             if ob_data is None and model_path:
-                ob_data = entity_meshes[model_path] = bpy.data.meshes.new("%s mesh" % entity_idx)
-                data = B3DTree().parse(model_path)
-                for i, texture in enumerate(data['textures'] if 'textures' in data else []):
-                    texture_name = os.path.basename(texture['name'])
-                    for mat in data.materials:
-                        if mat.tids[0]==i:
-                            images[i] = (texture_name, load_image(texture_name, game_path, check_existing=True,
-                                place_holder=False, recursive=IMAGE_SEARCH))
-
-                for i, mat in enumerate(data.materials if 'materials' in data else []):
-                    material = bpy.data.materials.new(mat.name)
-                    material.diffuse_color = random_color_gen.next()
-                    material_mapping[i] = material.name
-                    #material.diffuse_color = mat.rgba #B3D models have a material color but we're not exporting these so who cares.
-                    material.blend_method = 'BLEND' if mat.rgba[3] < 1.0 else 'OPAQUE'
-
-                    tid = mat.tids[0] if len(mat.tids) else -1
-
-                    if tid in images:
-                        name, image = images[tid]
-                        texture = bpy.data.textures.new(name=name, type='IMAGE')
-                        material.use_nodes = True
-                        bsdf = material.node_tree.nodes["Principled BSDF"]
-                        texImage = material.node_tree.nodes.new('ShaderNodeTexImage')
-                        texImage.image = image
-                        material.node_tree.links.new(bsdf.inputs['Base Color'], texImage.outputs['Color'])
-
-                for key, value in material_mapping.items():
-                    ob_data.materials.append(bpy.data.materials[value])
-
-                bm = bmesh.new()
-                import_node_recursive(data, material_mapping, bm)
-                bm.to_mesh(ob_data)
-                bm.free()
+                if use_proxies:
+                    ob_data = get_proxy_mesh(model_path, "%s proxy" % entity_idx)
+                else:
+                    ob_data = get_model_mesh(get_model_key(model_path))
+                    if ob_data is None:
+                        ob_data = build_model_mesh(model_path, "%s mesh" % entity_idx, prefetched_models.get(model_path),
+                                                   random_color_gen, images, material_mapping)
+
+                entity_meshes[model_path] = ob_data
 
             object_mesh = bpy.data.objects.new("%s mesh" % entity_idx, ob_data)
             object_mesh.rmesh.object_type = str(ObjectType.entity_mesh.value)
             entity_collection.objects.link(object_mesh)
+            if use_proxies and ob_data is not None:
+                object_mesh.rmesh.is_proxy = True
+                object_mesh.display_type = 'WIRE'
 
             object_mesh.rmesh.model_path = model_path
             object_mesh.rmesh.texture_path = texture_path
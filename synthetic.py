@@ -0,0 +1,211 @@
+#!/usr/bin/python3
+"""Deterministic synthetic RMESH rooms and B3D models for benchmarking, no Blender required."""
+
+import struct
+import numpy as np
+
+try:
+    from .process_rmesh import (
+        ENTITY_LAYOUTS,
+        TextureType,
+        RMesh,
+        MeshSection,
+        CollisionMesh,
+        TRIANGLE_DTYPE,
+        COLLISION_VERTEX_DTYPE,
+        make_vertex_array,
+        write_rmesh
+        )
+except ImportError:
+    from process_rmesh import (
+        ENTITY_LAYOUTS,
+        TextureType,
+        RMesh,
+        MeshSection,
+        CollisionMesh,
+        TRIANGLE_DTYPE,
+        COLLISION_VERTEX_DTYPE,
+        make_vertex_array,
+        write_rmesh
+        )
+
+DEFAULT_ENTITY_MIX = {
+    "waypoint": 20,
+    "light": 10,
+    "light_fix": 4,
+    "spotlight": 2,
+    "soundemitter": 4,
+    "screen": 1,
+    "save_screen": 1,
+    "model": 2,
+    "mesh": 8
+}
+
+def make_triangles(rng, vertex_count, triangle_count):
+    triangle_array = np.empty(triangle_count, dtype=TRIANGLE_DTYPE)
+    if vertex_count > 0:
+        for field_name in TRIANGLE_DTYPE.names:
+            triangle_array[field_name] = rng.integers(0, vertex_count, triangle_count, dtype=np.uint32)
+    else:
+        triangle_array[:] = 0
+
+    return triangle_array
+
+def make_mesh_section(rng, mesh_idx, vertex_count, triangle_count, is_rmesh2):
+    normal = None
+    if is_rmesh2:
+        normal = rng.normal(size=(vertex_count, 3))
+        normal /= np.maximum(np.linalg.norm(normal, axis=1), 1e-6)[:, None]
+
+    vertices = make_vertex_array(
+        rng.uniform(-1024.0, 1024.0, (vertex_count, 3)),
+        rng.uniform(0.0, 4.0, (vertex_count, 2)),
+        rng.uniform(0.0, 1.0, (vertex_count, 2)),
+        rng.integers(0, 256, (vertex_count, 3)),
+        normal
+    )
+    textures = [
+        {"texture_type": TextureType.lightmap.value, "texture_name": "synthetic_lm%s.png" % mesh_idx},
+        {"texture_type": TextureType.opaque.value, "texture_name": "synthetic_diffuse%s.jpg" % (mesh_idx % 8)}
+    ]
+
+    return MeshSection(textures, vertices, make_triangles(rng, vertex_count, triangle_count))
+
+def make_collision_mesh(rng, vertex_count, triangle_count):
+    vertices = np.empty(vertex_count, dtype=COLLISION_VERTEX_DTYPE)
+    vertices["position"] = rng.uniform(-1024.0, 1024.0, (vertex_count, 3))
+
+    return CollisionMesh(vertices, make_triangles(rng, vertex_count, triangle_count))
+
+def make_field_value(rng, field_name, field_format, entity_idx):
+    if field_format == "s":
+        if field_name == "color":
+            return "%s %s %s" % tuple(int(value) for value in rng.integers(0, 256, 3))
+        elif field_name == "euler_rotation":
+            return "%s %s %s" % tuple(round(float(value), 3) for value in rng.uniform(-180.0, 180.0, 3))
+        elif field_name == "model_name":
+            return "synthetic_model%s.b3d" % (entity_idx % 16)
+
+        return "synthetic_%s%s.jpg" % (field_name, entity_idx % 16)
+
+    field_count = int(field_format[:-1] or 1)
+    field_code = field_format[-1]
+    if field_code == "f":
+        values = [float(value) for value in np.float32(rng.uniform(-512.0, 512.0, field_count))]
+    elif field_code == "B":
+        values = [int(value) for value in rng.integers(0, 2, field_count)]
+    else:
+        values = [int(value) for value in rng.integers(0, 1024, field_count)]
+
+    if field_count == 1:
+        return values[0]
+
+    return values if field_name == "ff_array" else tuple(values)
+
+def make_entities(rng, entity_mix, is_rmesh2):
+    entities = []
+    for entity_type, entity_count in sorted(entity_mix.items()):
+        entity_layout = ENTITY_LAYOUTS[(entity_type, is_rmesh2)]
+        for entity_idx in range(entity_count):
+            field_values = [make_field_value(rng, field[0], field[1], entity_idx) for field in entity_layout.fields]
+            entities.append(entity_layout.record_class(*field_values))
+
+    return entities
+
+def make_synthetic_rmesh(is_rmesh2=False, mesh_count=16, vertex_count=2048, triangle_count=2048, collision_mesh_count=4,
+                         entity_mix=None, seed=0):
+    """Build a room with the given section count, per section vertex and triangle counts and entity mix"""
+    rng = np.random.default_rng(seed)
+    if entity_mix is None:
+        entity_mix = DEFAULT_ENTITY_MIX
+
+    rmesh_file_type = "RoomMesh2" if is_rmesh2 else "RoomMesh"
+    meshes = [make_mesh_section(rng, mesh_idx, vertex_count, triangle_count, is_rmesh2) for mesh_idx in range(mesh_count)]
+    collision_meshes = [make_collision_mesh(rng, vertex_count, triangle_count) for collision_idx in range(collision_mesh_count)]
+
+    return RMesh(rmesh_file_type, meshes, collision_meshes, make_entities(rng, entity_mix, is_rmesh2))
+
+def write_synthetic_rmesh(output_path, **kwargs):
+    write_rmesh(make_synthetic_rmesh(**kwargs), output_path)
+
+def b3d_chunk(tag, *payloads):
+    payload = b"".join(payloads)
+    return tag + struct.pack("<i", len(payload)) + payload
+
+def b3d_string(value):
+    return value.encode("utf-8") + b"\x00"
+
+def make_b3d_mesh(rng, vertex_count, triangle_count, brush_id, use_colors):
+    flags = 1 | (2 if use_colors else 0)
+    columns = [rng.uniform(-256.0, 256.0, (vertex_count, 3)), rng.normal(size=(vertex_count, 3))]
+    if use_colors:
+        columns.append(rng.uniform(0.0, 1.0, (vertex_count, 4)))
+
+    columns.append(rng.uniform(0.0, 1.0, (vertex_count, 2)))
+    vertex_data = np.hstack(columns).astype("<f4")
+    triangle_data = rng.integers(0, max(vertex_count, 1), (triangle_count, 3)).astype("<i4")
+
+    vrts = b3d_chunk(b"VRTS", struct.pack("<3i", flags, 1, 2), vertex_data.tobytes())
+    tris = b3d_chunk(b"TRIS", struct.pack("<i", brush_id), triangle_data.tobytes())
+
+    return b3d_chunk(b"MESH", struct.pack("<i", -1), vrts, tris)
+
+def make_b3d_node(rng, name, vertex_count, triangle_count, brush_id, use_colors, key_count, bone_count, children=()):
+    payload = [b3d_string(name), struct.pack("<10f", 0.0, 0.0, 0.0, 1.0, 1.0, 1.0, 1.0, 0.0, 0.0, 0.0)]
+    if vertex_count > 0:
+        payload.append(make_b3d_mesh(rng, vertex_count, triangle_count, brush_id, use_colors))
+
+    if bone_count > 0:
+        bone_data = np.empty(bone_count, dtype=[("vertex_id", "<i4"), ("weight", "<f4")])
+        bone_data["vertex_id"] = rng.integers(0, max(vertex_count, 1), bone_count)
+        bone_data["weight"] = rng.uniform(0.0, 1.0, bone_count)
+        payload.append(b3d_chunk(b"BONE", bone_data.tobytes()))
+
+    if key_count > 0:
+        key_data = np.empty(key_count, dtype=[("frame", "<i4"), ("values", "<f4", (10,))])
+        key_data["frame"] = np.arange(key_count)
+        key_data["values"] = rng.uniform(-1.0, 1.0, (key_count, 10))
+        payload.append(b3d_chunk(b"KEYS", struct.pack("<i", 7), key_data.tobytes()))
+
+    payload.extend(children)
+
+    return b3d_chunk(b"NODE", *payload)
+
+def make_synthetic_b3d(node_count=4, vertex_count=1024, triangle_count=1024, texture_count=2, use_colors=False,
+                       key_count=0, bone_count=0, seed=0):
+    """Build a B3D model with a root node and node_count - 1 child nodes, each holding one mesh"""
+    rng = np.random.default_rng(seed)
+
+    texs = []
+    for texture_idx in range(texture_count):
+        texs.append(b3d_string("synthetic_texture%s.jpg" % texture_idx))
+        texs.append(struct.pack("<2i5f", 1, 2, 0.0, 0.0, 1.0, 1.0, 0.0))
+
+    brus = [struct.pack("<i", 1)]
+    for brush_idx in range(max(texture_count, 1)):
+        brus.append(b3d_string("synthetic_brush%s" % brush_idx))
+        brus.append(struct.pack("<5f2i", 1.0, 1.0, 1.0, 1.0, 0.0, 1, 0))
+        brus.append(struct.pack("<i", brush_idx if texture_count else -1))
+
+    brush_count = max(texture_count, 1)
+    children = [make_b3d_node(rng, "synthetic_node%s" % node_idx, vertex_count, triangle_count, node_idx % brush_count,
+                              use_colors, key_count, bone_count) for node_idx in range(1, node_count)]
+    root_children = []
+    if key_count > 0:
+        root_children.append(b3d_chunk(b"ANIM", struct.pack("<2if", 0, key_count, 30.0)))
+
+    root_children.extend(children)
+    root = make_b3d_node(rng, "synthetic_root", vertex_count, triangle_count, 0, use_colors, key_count, bone_count, root_children)
+
+    chunks = [struct.pack("<i", 1)]
+    if texture_count:
+        chunks.append(b3d_chunk(b"TEXS", *texs))
+
+    chunks.append(b3d_chunk(b"BRUS", *brus))
+    chunks.append(root)
+
+    return b3d_chunk(b"BB3D", *chunks)
+
+def write_synthetic_b3d(output_path, **kwargs):
+    with open(output_path, "wb") as b3d_stream:
+        b3d_stream.write(make_synthetic_b3d(**kwargs))